@@ -0,0 +1,19 @@
+"""
+URL configuration of the ASGI deployment (see asgi.py).
+
+Same routes as Excercize/urls.py, but the list and detail endpoints are
+served by the async views in api/async_views.py.
+"""
+from django.contrib import admin
+from django.urls import path, include
+from django.conf import settings
+from django.conf.urls.static import static
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('api/', include('api.async_urls')),
+]
+
+
+if settings.DEBUG:
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
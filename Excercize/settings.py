@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 
@@ -35,7 +36,17 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 5
+    'PAGE_SIZE': 5,
+    # JSONRenderer stays first: DRF falls back to the first renderer when it cannot
+    # negotiate (a 406, for example). ORJSONRenderer only answers
+    # "Accept: application/json; encoder=orjson", see api.renderers.ContentNegotiation.
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS': 'api.renderers.ContentNegotiation',
 }
 
 
@@ -53,6 +64,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.SQLInstrumentationMiddleware',
+    'api.metrics.MetricsMiddleware',
+    'api.routers.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,7 +76,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'Excercize.urls'
+# asgi.py switches to Excercize.asgi_urls, which serves the async views.
+ROOT_URLCONF = os.environ.get('DJANGO_ROOT_URLCONF', 'Excercize.urls')
 
 TEMPLATES = [
     {
@@ -85,20 +100,162 @@ WSGI_APPLICATION = 'Excercize.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
-
-
+#
+# The connection comes from the DB_* environment variables (docker-compose.yml
+# sets them). Every worker process keeps a psycopg pool of DB_POOL_MIN_SIZE to
+# DB_POOL_MAX_SIZE open connections, which are checked before they are handed
+# out. Size it so that workers * DB_POOL_MAX_SIZE stays below the server's
+# max_connections. Without psycopg 3, or with DB_POOL=0, connections are kept
+# for DB_CONN_MAX_AGE seconds instead and health-checked before reuse.
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'postgre_database',
-        'USER': 'marty',
-        'PASSWORD': '1234',
-        'HOST': 'db',
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'postgre_database'),
+        'USER': os.environ.get('DB_USER', 'marty'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', '1234'),
+        'HOST': os.environ.get('DB_HOST', 'db'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
     }
 }
 
+if os.environ.get('DB_POOL', '1') == '1' and find_spec('psycopg_pool'):
+    from psycopg_pool import ConnectionPool
+
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 4)),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'check': ConnectionPool.check_connection,
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Read replicas (api/routers.py). DB_REPLICA_HOSTS is a comma separated list
+# of hosts that stream from the primary. GET requests read from a random
+# replica. Writes, transactions and the reads of a client that wrote within
+# REPLICA_PIN_SECONDS go to the primary.
+#
+# In tests the replicas mirror the test database, unless
+# DB_REPLICA_SEPARATE_TEST=1 gives each one its own test database. Nothing is
+# replicated between them then, which ReplicaDatabaseTestCase needs to see
+# where every read went. Against a local server:
+#
+#   DB_HOST=localhost DB_REPLICA_HOSTS=localhost DB_REPLICA_SEPARATE_TEST=1 \
+#       python manage.py test api.tests.ReplicaDatabaseTestCase
+#
+# DB_REPLICA_NAME points the replicas at another database than DB_NAME.
+DATABASE_REPLICAS = []
+for number, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    replica_name = os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME'])
+    if os.environ.get('DB_REPLICA_SEPARATE_TEST') == '1':
+        replica_test = {'NAME': f'test_{replica_name}_replica{number}'}
+    else:
+        replica_test = {'MIRROR': 'default'}
+    DATABASES[f'replica{number}'] = {**DATABASES['default'], 'NAME': replica_name, 'HOST': host.strip(), 'TEST': replica_test}
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+REPLICA_PIN_COOKIE = 'db_primary'
+
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+#
+# The "responses" cache holds the versioned list responses and the model
+# generations that invalidate them (api/cache.py). Every process that writes
+# the models (the gunicorn workers, the asgi server, the bulk job worker) must
+# bump the same generations, so the default is the file backend in
+# RESPONSE_CACHE_DIR, a directory all of them mount. locmem lives in one
+# process and is refused at startup unless RESPONSE_CACHE_SINGLE_PROCESS=1
+# (e.g. runserver). Both backends evict LRU-first.
+
+RESPONSE_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'api.cache_backends.LRUFileBasedCache',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': RESPONSE_CACHE_BACKENDS[os.environ.get('RESPONSE_CACHE_BACKEND', 'file')],
+        'LOCATION': os.environ.get('RESPONSE_CACHE_DIR', str(BASE_DIR / 'cache' / 'responses')),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 5000)),
+            'CULL_FREQUENCY': 10,
+        },
+    },
+    # When each model was last written, which decides whether a cached list is
+    # recomputed on the primary (api/cache.py). Every process that serves
+    # reads must see it, so it has its own shared directory and is never
+    # culled by the response LRU. Deployments spread over several hosts can
+    # point it at a DatabaseCache, whose reads the router sends to the primary.
+    'replica_pins': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('REPLICA_PIN_CACHE_DIR', str(BASE_DIR / 'cache' / 'replica_pins')),
+        'TIMEOUT': None,
+    },
+}
+
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = 300
+RESPONSE_CACHE_SINGLE_PROCESS = os.environ.get('RESPONSE_CACHE_SINGLE_PROCESS', '0') == '1'
+REPLICA_PIN_CACHE_ALIAS = 'replica_pins'
+
+# Identical concurrent list requests are computed once (api/singleflight.py).
+# Worker processes on one host coordinate through lock files in
+# SINGLE_FLIGHT_LOCK_DIR (one per in-flight key) and share the result through
+# the "responses" cache. A request waits at most SINGLE_FLIGHT_WAIT seconds for
+# another one's result before computing its own.
+SINGLE_FLIGHT_LOCK_DIR = os.environ.get('SINGLE_FLIGHT_LOCK_DIR')
+SINGLE_FLIGHT_WAIT = 30
+SINGLE_FLIGHT_TTL = 2
+
+# Per-request query count and timings (api/instrumentation.py), sent back as
+# Server-Timing and X-Query-Count headers. Requests slower than SLOW_REQUEST_MS
+# are logged with their SQL to the "api.slow_requests" logger, one JSON object
+# per line.
+SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', '1') == '1'
+SQL_INSTRUMENTATION_HEADERS = os.environ.get('SQL_INSTRUMENTATION_HEADERS', '1' if DEBUG else '0') == '1'
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_MAX_QUERIES = 100
+
+# Request metrics (api/metrics.py). Every worker process writes its own
+# memory-mapped file in METRICS_DIR and GET /api/metrics/ reports the totals of
+# all of them, so the directory must be shared by the workers of one server.
+# The gunicorn master (gunicorn.conf.py) empties it on start and archives the
+# files of exited workers, so each server needs a directory of its own.
+METRICS = os.environ.get('METRICS', '1') == '1'
+METRICS_DIR = os.environ.get('METRICS_DIR', str(BASE_DIR / 'cache' / 'metrics'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_requests': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'api.slow_requests': {
+            'handlers': ['slow_requests'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
 
 
 # Password validation
@@ -0,0 +1,15 @@
+from django.urls import path
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+ASYNC_VIEWS = {
+    'companies': async_views.company_list,
+    'company_detail': async_views.manage_company,
+    'employees': async_views.employee_list,
+    'employee_detail': async_views.manage_employee,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS.get(pattern.name, pattern.callback), name=pattern.name)
+    for pattern in sync_urlpatterns
+]
@@ -0,0 +1,266 @@
+"""
+Async versions of the list and detail views, served by the ASGI URLconf
+(``Excercize.asgi_urls``).
+
+Reads go through the async ORM. Writes are delegated to the sync views in a
+worker thread, because DRF serializers save synchronously, so both
+deployments share one write path and behave identically.
+"""
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.views.decorators.http import condition
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from . import views
+from .cache import cached_response, coalesced
+from .conditional import (
+    company_etag, company_last_modified, employee_etag, employee_last_modified, list_etag
+)
+from .fields import (
+    COMPANY_FIELDS, EMPLOYEE_FIELDS, employee_queryset, only_columns, requested_fields, wants_employees
+)
+from .filters import (
+    COMPANY_ORDERING_FIELDS, EMPLOYEE_ORDERING_FIELDS, asearch_employees, filter_companies, filter_employees,
+    order_queryset, search_companies
+)
+from .models import Company, Employee
+from .pagination import get_paginator
+from .serializer import CompanySerializer, EmployeeSerializer, read_data
+from .views import extended_employees, invalid_ordering
+
+
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView with an async dispatch. Authentication and permission checks may
+    query the database (sessions, users), so ``initial()`` runs in a thread.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if iscoroutinefunction(handler):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def async_api_view(http_method_names):
+    """@api_view for ``async def`` function views."""
+    def decorator(func):
+        WrappedAPIView = type('WrappedAPIView', (AsyncAPIView,), {'__doc__': func.__doc__})
+        WrappedAPIView.http_method_names = [method.lower() for method in {*http_method_names, 'options'}]
+
+        async def handler(self, *args, **kwargs):
+            return await func(*args, **kwargs)
+
+        for method in http_method_names:
+            setattr(WrappedAPIView, method.lower(), handler)
+
+        WrappedAPIView.__name__ = func.__name__
+        WrappedAPIView.__module__ = func.__module__
+        return WrappedAPIView.as_view()
+    return decorator
+
+
+def acondition(etag_func=None, last_modified_func=None):
+    """
+    condition() for async views. The validator functions query the database,
+    so they run in a thread first. They cache their result on the request,
+    and condition() then reads it without blocking the event loop.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            def compute_validators():
+                for func in (etag_func, last_modified_func):
+                    if func:
+                        func(request, *args, **kwargs)
+
+            await sync_to_async(compute_validators)()
+            return await conditional_view(request, *args, **kwargs)
+        return inner
+    return decorator
+
+
+async def sync_view(view, request, *args, **kwargs):
+    return await sync_to_async(view)(request._request, *args, **kwargs)
+
+
+
+
+
+@acondition(etag_func=list_etag)
+@async_api_view(['GET', 'POST'])
+@cached_response('company_list', ['api.company', 'api.employee'])
+async def company_list(request):
+    if request.method != 'GET':
+        return await sync_view(views.company_list, request)
+
+    fields, error = requested_fields(request, COMPANY_FIELDS, ['employees'])
+    if error:
+        return error
+    with_employees = wants_employees(request)
+    fields = [field for field in fields if field != 'employees']
+
+    all_company = filter_companies(
+        Company.objects.only(*only_columns(Company, fields, request.GET.get('ordering') or 'name')), request.GET
+    )
+
+    search = request.GET.get('search', None)
+    if search:
+        all_company = search_companies(all_company, search)
+        if not await all_company.aexists():
+            return Response(
+                {"message": f"No companies found matching the search criteria. ({search})"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+    ordering = request.GET.get('ordering', None)
+    if ordering:
+        error = invalid_ordering(ordering, COMPANY_ORDERING_FIELDS)
+        if error:
+            return error
+        all_company = order_queryset(all_company, ordering)
+    else:
+        ordering = 'name'
+        all_company = order_queryset(all_company, ordering, search)
+
+    all_company = all_company.distinct()
+
+    paginator = get_paginator(request, ordering)
+    paginated_companies = await paginator.apaginate_queryset(all_company, request)
+
+    if with_employees:
+        employees_map = {}
+        async for employee in (
+            Employee.objects.filter(company_id__in=[company.id for company in paginated_companies])
+            .values('company_id', 'id', 'name', 'job_title')
+        ):
+            employees_map.setdefault(employee['company_id'], []).append(employee)
+
+        serialized_companies = []
+        for company in paginated_companies:
+            company_data = read_data(CompanySerializer, company, fields=fields)
+            company_data['employees'] = employees_map.get(company.id, [])
+            serialized_companies.append(company_data)
+    else:
+        serialized_companies = read_data(CompanySerializer, paginated_companies, many=True, fields=fields)
+
+    return paginator.get_paginated_response(serialized_companies)
+
+
+
+
+@acondition(etag_func=company_etag, last_modified_func=company_last_modified)
+@async_api_view(['GET', 'PATCH', 'DELETE'])
+async def manage_company(request, pk):
+    if request.method != 'GET':
+        return await sync_view(views.manage_company, request, pk=pk)
+
+    fields, error = requested_fields(request, COMPANY_FIELDS, ['employees'])
+    if error:
+        return error
+
+    companies = Company.objects.only(*only_columns(Company, fields))
+    if wants_employees(request):
+        companies = companies.prefetch_related('employees')
+
+    try:
+        company = await companies.aget(pk=pk)
+    except Company.DoesNotExist:
+        return Response({'error': 'Company not found!'}, status=status.HTTP_404_NOT_FOUND)
+
+    return extended_employees(
+        request, CompanySerializer, company,
+        fields=[field for field in fields if field != 'employees'],
+        many = False
+    )
+
+
+
+
+@acondition(etag_func=list_etag)
+@async_api_view(['GET', 'POST'])
+@coalesced('employee_list', ['api.employee', 'api.company'])
+async def employee_list(request):
+    if request.method != 'GET':
+        return await sync_view(views.employee_list, request)
+
+    fields, error = requested_fields(request, EMPLOYEE_FIELDS)
+    if error:
+        return error
+
+    all_employee = filter_employees(employee_queryset(fields, request.GET.get('ordering') or 'id'), request.GET)
+
+    if not await all_employee.aexists():
+        return Response(
+                {"message": "No employees found matching the filtering criteria."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+    search = request.GET.get('search', None)
+    if search:
+        all_employee = await asearch_employees(all_employee, search)
+        if not await all_employee.aexists():
+            return Response(
+                {"message": f"No employees found matching the search criteria. ({search})"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+    ordering = request.GET.get('ordering', None)
+    if ordering:
+        error = invalid_ordering(ordering, EMPLOYEE_ORDERING_FIELDS)
+        if error:
+            return error
+        all_employee = order_queryset(all_employee, ordering)
+    else:
+        ordering = 'id'
+        all_employee = order_queryset(all_employee, ordering, search)
+
+    paginator = get_paginator(request, ordering)
+    paginated_data = await paginator.apaginate_queryset(all_employee, request)
+    return paginator.get_paginated_response(read_data(EmployeeSerializer, paginated_data, many=True, fields=fields))
+
+
+
+
+@acondition(etag_func=employee_etag, last_modified_func=employee_last_modified)
+@async_api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
+async def manage_employee(request, pk):
+    if request.method != 'GET':
+        return await sync_view(views.manage_employee, request, pk=pk)
+
+    fields, error = requested_fields(request, EMPLOYEE_FIELDS)
+    if error:
+        return error
+
+    try:
+        employee = await employee_queryset(fields).aget(pk=pk)
+    except Employee.DoesNotExist:
+        return Response({'error': 'Employee not found!'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(read_data(EmployeeSerializer, employee, fields=fields), status=status.HTTP_200_OK)
@@ -0,0 +1,255 @@
+from collections import Counter
+from contextvars import ContextVar
+import uuid
+
+from django.db import transaction
+from django.db.models import Count
+from rest_framework import serializers
+from .models import Company, Employee
+from .serializer import CompanySerializer, EmployeeSerializer
+
+
+BULK_UPDATE_BATCH_SIZE = 1000
+MAX_BULK_UPDATE_BATCH_SIZE = 10000
+
+COMPANY_UPDATE_FIELDS = ['name', 'address', 'phone', 'description']
+
+# Companies whose employees delete_companies already checked, so the
+# prevent_company_deletion signal does not query again for each of them.
+checked_company_deletions = ContextVar('checked_company_deletions', default=frozenset())
+
+
+
+
+def parse_uuid(value):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def validate_rows(serializer, rows, instances=None):
+    """
+    Validate ``rows`` one by one with a single prepared serializer.
+
+    Returns ``(validated, errors)`` where ``validated`` holds ``(index, instance,
+    validated_data)`` tuples and ``errors`` holds ``(index, detail)`` tuples.
+    With ``instances`` every row must carry the ``id`` of one of them.
+    """
+    model_name = serializer.Meta.model._meta.verbose_name.capitalize()
+
+    validated = []
+    errors = []
+    for index, data in enumerate(rows):
+        instance = None
+        if instances is not None:
+            row_id = data.get('id') if isinstance(data, dict) else None
+            if not row_id:
+                errors.append((index, {'error': 'Each update must include an ID.'}))
+                continue
+
+            instance = instances.get(parse_uuid(row_id))
+            if instance is None:
+                errors.append((index, {'error': f'{model_name} ID {row_id} not found.'}))
+                continue
+
+        serializer.instance = instance
+        serializer.initial_data = data
+        try:
+            validated.append((index, instance, serializer.run_validation(data)))
+        except serializers.ValidationError as e:
+            errors.append((index, e.detail))
+
+    return validated, errors
+
+
+def validate_employee_rows(serializer, rows, instances=None):
+    serializer.prepare_bulk_validation(rows)
+    return validate_rows(serializer, rows, instances)
+
+
+def create_employees(rows, context, all_or_nothing=True):
+    """Insert the valid rows with one bulk_create. Returns ``(created_count, errors)``."""
+    validated, errors = validate_employee_rows(EmployeeSerializer(context=context), rows)
+    if errors and all_or_nothing:
+        return 0, errors
+
+    employees = [Employee(**validated_data) for _, _, validated_data in validated]
+    for employee in employees:
+        employee.update_search_document()
+
+    with transaction.atomic():
+        Employee.objects.bulk_create(employees)
+        Company.objects.adjust_employee_counts(Counter(employee.company_id for employee in employees))
+
+    return len(employees), errors
+
+
+def delete_employees(employee_ids):
+    """Delete the given employees. Returns ``(deleted_count, non_existing_ids)``."""
+    parsed_ids = {employee_id: parse_uuid(employee_id) for employee_id in employee_ids}
+
+    with transaction.atomic():
+        existing_employees = list(
+            Employee.objects.select_for_update()
+            .filter(id__in=[parsed for parsed in parsed_ids.values() if parsed])
+            .values_list('id', 'company_id')
+        )
+        existing_ids = set(emp_id for emp_id, _ in existing_employees)
+
+        non_existing_ids = [emp_id for emp_id in employee_ids if parsed_ids[emp_id] not in existing_ids]
+
+        deleted_count, _ = Employee.objects.filter(id__in=existing_ids).delete()
+        Company.objects.adjust_employee_counts({
+            company_id: -count for company_id, count in Counter(company_id for _, company_id in existing_employees).items()
+        })
+
+    return deleted_count, non_existing_ids
+
+
+def update_employees(rows, context, partial, batch_size=BULK_UPDATE_BATCH_SIZE, all_or_nothing=True):
+    """
+    Validate every row, then write the union of the changed fields with one
+    bulk_update. Returns ``(updated_count, errors)``.
+    """
+    with transaction.atomic():
+        employee_ids = {parse_uuid(data.get('id')) for data in rows if isinstance(data, dict)}
+        employees = Employee.objects.select_for_update().in_bulk(employee_ids - {None})
+        loaded_company_ids = {employee_id: employee.company_id for employee_id, employee in employees.items()}
+
+        serializer = EmployeeSerializer(partial=partial, context=context)
+        validated, errors = validate_employee_rows(serializer, rows, instances=employees)
+        if errors and all_or_nothing:
+            return 0, errors
+
+
+        # Rows are applied last to first, so when an ID is sent more than once the first row wins.
+        update_fields = set()
+        for _, employee, validated_data in reversed(validated):
+            for attr, value in validated_data.items():
+                setattr(employee, attr, value)
+            update_fields.update(validated_data)
+
+        employees_to_update = list({employee.pk: employee for _, employee, _ in validated}.values())
+        for employee in employees_to_update:
+            employee.bump_version()
+        if update_fields & set(Employee.SEARCH_FIELDS):
+            for employee in employees_to_update:
+                employee.update_search_document()
+            update_fields.add('search_document')
+
+        if employees_to_update and update_fields:
+            update_fields.update(['version', 'updated_at'])
+            Employee.objects.bulk_update(employees_to_update, sorted(update_fields), batch_size=batch_size)
+
+            company_deltas = Counter()
+            for employee in employees_to_update:
+                if employee.company_id != loaded_company_ids[employee.pk]:
+                    company_deltas[loaded_company_ids[employee.pk]] -= 1
+                    company_deltas[employee.company_id] += 1
+            Company.objects.adjust_employee_counts(company_deltas)
+
+    return len(validated), errors
+
+
+
+
+def create_companies(rows, context, all_or_nothing=True):
+    """
+    Insert the valid companies and their nested ``employees`` with one
+    bulk_create per model, in one transaction. Returns
+    ``(created_count, employee_count, errors)``.
+    """
+    serializer = CompanySerializer(context=context)
+    serializer.fields['employees'].child.prepare_bulk_validation([
+        employee
+        for row in rows if isinstance(row, dict) and isinstance(row.get('employees'), list)
+        for employee in row['employees']
+    ])
+
+    validated, errors = validate_rows(serializer, rows)
+    if errors and all_or_nothing:
+        return 0, 0, errors
+
+    companies = []
+    employees = []
+    for _, _, validated_data in validated:
+        employees_data = validated_data.pop('employees', [])
+        company = Company(employee_count=len(employees_data), **validated_data)
+        companies.append(company)
+        employees += [Employee(company=company, **employee_data) for employee_data in employees_data]
+
+    for instance in [*companies, *employees]:
+        instance.update_search_document()
+
+    with transaction.atomic():
+        Company.objects.bulk_create(companies)
+        Employee.objects.bulk_create(employees)
+
+    return len(companies), len(employees), errors
+
+
+def update_companies(rows, context, batch_size=BULK_UPDATE_BATCH_SIZE, all_or_nothing=True):
+    """
+    Partially update every row, then write the union of the changed fields
+    with one bulk_update. Returns ``(updated_count, errors)``.
+    """
+    with transaction.atomic():
+        company_ids = {parse_uuid(data.get('id')) for data in rows if isinstance(data, dict)}
+        companies = Company.objects.select_for_update().in_bulk(company_ids - {None})
+
+        serializer = CompanySerializer(partial=True, context=context, fields=COMPANY_UPDATE_FIELDS)
+        validated, errors = validate_rows(serializer, rows, instances=companies)
+        if errors and all_or_nothing:
+            return 0, errors
+
+        # Rows are applied last to first, so when an ID is sent more than once the first row wins.
+        update_fields = set()
+        for _, company, validated_data in reversed(validated):
+            for attr, value in validated_data.items():
+                setattr(company, attr, value)
+            update_fields.update(validated_data)
+
+        companies_to_update = list({company.pk: company for _, company, _ in validated}.values())
+        if companies_to_update and update_fields:
+            for company in companies_to_update:
+                company.bump_version()
+                company.update_search_document()
+            update_fields.update(['search_document', 'version', 'updated_at'])
+            Company.objects.bulk_update(companies_to_update, sorted(update_fields), batch_size=batch_size)
+
+    return len(validated), errors
+
+
+def delete_companies(company_ids):
+    """
+    Delete the given companies that have no employees. Their employees are
+    counted with one grouped query. Returns ``(deleted_count, blocked,
+    non_existing_ids)``, where ``blocked`` maps each company that still has
+    employees to their number.
+    """
+    parsed_ids = {company_id: parse_uuid(company_id) for company_id in company_ids}
+
+    with transaction.atomic():
+        existing_ids = set(
+            Company.objects.select_for_update()
+            .filter(id__in=[parsed for parsed in parsed_ids.values() if parsed])
+            .values_list('id', flat=True)
+        )
+        blocked = dict(
+            Employee.objects.filter(company_id__in=existing_ids)
+            .order_by()
+            .values('company_id')
+            .annotate(count=Count('pk'))
+            .values_list('company_id', 'count')
+        )
+
+        deletable_ids = existing_ids - blocked.keys()
+        token = checked_company_deletions.set(frozenset(deletable_ids))
+        try:
+            deleted_count = Company.objects.filter(id__in=deletable_ids).delete()[1].get(Company._meta.label, 0)
+        finally:
+            checked_company_deletions.reset(token)
+
+    non_existing_ids = [company_id for company_id in company_ids if parsed_ids[company_id] not in existing_ids]
+    return deleted_count, blocked, non_existing_ids
@@ -0,0 +1,307 @@
+from functools import wraps
+from hashlib import md5
+from inspect import iscoroutinefunction
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+from .routers import replicas, use_primary
+from .singleflight import CACHED, COALESCED, asingle_flight, single_flight
+
+
+
+
+def response_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def check_response_cache():
+    """
+    The generations must be shared by every process that writes the models.
+    A locmem cache only sees the writes of its own process, so the others
+    would keep serving stale responses: refuse it unless the deployment runs
+    a single process.
+    """
+    if getattr(settings, 'RESPONSE_CACHE_SINGLE_PROCESS', False):
+        return
+    if isinstance(response_cache(), LocMemCache):
+        raise ImproperlyConfigured(
+            'The response cache cannot use LocMemCache when several processes write the models. '
+            'Use a shared backend (RESPONSE_CACHE_BACKEND=file) or set RESPONSE_CACHE_SINGLE_PROCESS=1.'
+        )
+    if replicas() and isinstance(write_times(), LocMemCache):
+        raise ImproperlyConfigured(
+            'The REPLICA_PIN_CACHE_ALIAS cache cannot use LocMemCache: the write times must be shared by every process.'
+        )
+
+
+def generation_key(label):
+    return f'generation:{label}'
+
+
+def get_generations(labels):
+    """
+    Current generation of each model label. A missing counter (never written,
+    or evicted) is reseeded from the clock, so it can never fall back to a
+    generation an older cache entry was stored under.
+    """
+    cache = response_cache()
+    keys = [generation_key(label) for label in labels]
+    generations = cache.get_many(keys)
+
+    for key in keys:
+        if key not in generations:
+            cache.add(key, time.time_ns(), timeout=None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def _bump(labels):
+    cache = response_cache()
+    for label in labels:
+        key = generation_key(label)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+    if replicas():
+        write_times().set_many({written_key(label): time.time() for label in labels}, timeout=None)
+
+
+def write_times():
+    """Shared by every process and host, unlike a per-host response cache."""
+    return caches[getattr(settings, 'REPLICA_PIN_CACHE_ALIAS', 'default')]
+
+
+def written_key(label):
+    return f'written:{label}'
+
+
+def recently_written(labels):
+    """
+    Whether any of the models was written within REPLICA_PIN_SECONDS, i.e.
+    while the replicas may not have the write yet.
+    """
+    if not replicas():
+        return False
+
+    window = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+    written = write_times().get_many([written_key(label) for label in labels]).values()
+    return any(time.time() - moment < window for moment in written)
+
+
+async def arecently_written(labels):
+    if not replicas():
+        return False
+    return await sync_to_async(recently_written, thread_sensitive=False)(labels)
+
+
+def bump_generations(*labels, using=None):
+    """
+    Invalidate every cached response built from the given models. The bump
+    runs now, so the writer's own follow-up reads miss, and again after the
+    commit, so a response computed from pre-commit rows in the meantime is
+    dropped as well.
+    """
+    labels = tuple(dict.fromkeys(labels))
+    _bump(labels)
+    transaction.on_commit(lambda: _bump(labels), using=using)
+
+
+
+
+def record(outcome):
+    cache = response_cache()
+    key = f'stats:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+STATS = ['hit', 'miss', 'coalesced']
+
+
+def cache_stats():
+    stats = response_cache().get_many([f'stats:{outcome}' for outcome in STATS])
+    hits, misses = stats.get('stats:hit', 0), stats.get('stats:miss', 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+        'coalesced': stats.get('stats:coalesced', 0),
+    }
+
+
+def reset_cache_stats():
+    response_cache().delete_many([f'stats:{outcome}' for outcome in STATS])
+
+
+
+
+# Query parameters holding an unordered, comma separated list.
+LIST_PARAMS = ['fields']
+
+
+def normalized_list(value):
+    """A comma separated list in a canonical order: ``?fields=b,a`` and ``?fields=a,b`` are the same response."""
+    return ','.join(sorted({item.strip() for item in value.split(',') if item.strip()}))
+
+
+def normalized_query(request):
+    """The query string with its parameters, and their listed items, sorted, so equivalent URLs share an entry."""
+    params = sorted(
+        (key, normalized_list(value) if key in LIST_PARAMS else value)
+        for key in request.GET for value in request.GET.getlist(key)
+    )
+    return '&'.join(f'{key}={value}' for key, value in params)
+
+
+def response_key(name, request, generations):
+    digest = md5('|'.join([
+        request.get_host(),
+        request.path,
+        normalized_query(request),
+        request.META.get('HTTP_ACCEPT', ''),
+    ]).encode(), usedforsecurity=False).hexdigest()
+    return f"response:{name}:{'.'.join(map(str, generations))}:{digest}"
+
+
+def lookup(name, request, labels):
+    """The cache key of ``request`` and its cached data, or None on a miss."""
+    key = response_key(name, request, get_generations(labels))
+    data = response_cache().get(key)
+    record('miss' if data is None else 'hit')
+    return key, data
+
+
+def cached_response(name, labels, timeout=None):
+    """
+    Cache the data of successful GET responses, keyed on the normalized query
+    parameters and the generation of every model label the response reads.
+    Writes to those models bump the generation, so stale entries are never
+    looked up again and simply age out of the LRU. Concurrent misses for the
+    same key are computed once (see single_flight).
+    """
+    def decorator(view):
+        timeout_ = timeout or getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method != 'GET':
+                    return await view(request, *args, **kwargs)
+
+                key, data = await sync_to_async(lookup, thread_sensitive=False)(name, request, labels)
+                if data is not None:
+                    return cache_hit(data)
+                with use_primary(await arecently_written(labels)):
+                    response = await acoalesced_response(response_cache(), key, view, request, args, kwargs, timeout_)
+                response.setdefault('X-Cache', 'MISS')
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+
+            key, data = lookup(name, request, labels)
+            if data is not None:
+                return cache_hit(data)
+            with use_primary(recently_written(labels)):
+                response = coalesced_response(response_cache(), key, view, request, args, kwargs, timeout_)
+            response.setdefault('X-Cache', 'MISS')
+            return response
+        return wrapper
+    return decorator
+
+
+def cache_hit(data):
+    response = Response(data, status=status.HTTP_200_OK)
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def coalesced(name, labels, timeout=None):
+    """
+    Single-flight the GET requests of a list view. Identical requests that
+    arrive while one is computing wait for it and share its serialized data.
+    The shared result is kept for a few seconds only, under the model
+    generations, so a write is never hidden by it.
+    """
+    def decorator(view):
+        timeout_ = timeout or getattr(settings, 'SINGLE_FLIGHT_TTL', 2)
+
+        def flight_key(request):
+            return response_key(f'flight:{name}', request, get_generations(labels))
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method != 'GET':
+                    return await view(request, *args, **kwargs)
+
+                key = await sync_to_async(flight_key, thread_sensitive=False)(request)
+                with use_primary(await arecently_written(labels)):
+                    return await acoalesced_response(response_cache(), key, view, request, args, kwargs, timeout_)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+
+            with use_primary(recently_written(labels)):
+                return coalesced_response(response_cache(), flight_key(request), view, request, args, kwargs, timeout_)
+        return wrapper
+    return decorator
+
+
+def coalesced_response(cache, key, view, request, args, kwargs, timeout):
+    responses = []
+
+    def compute():
+        response = view(request, *args, **kwargs)
+        responses.append(response)
+        return response.status_code, response.data
+
+    status_code, data, outcome = single_flight(cache, key, compute, timeout)
+    if outcome == COALESCED:
+        record('coalesced')
+    return shared_response(responses, status_code, data, outcome)
+
+
+async def acoalesced_response(cache, key, view, request, args, kwargs, timeout):
+    responses = []
+
+    async def compute():
+        response = await view(request, *args, **kwargs)
+        responses.append(response)
+        return response.status_code, response.data
+
+    status_code, data, outcome = await asingle_flight(cache, key, compute, timeout)
+    if outcome == COALESCED:
+        await sync_to_async(record, thread_sensitive=False)('coalesced')
+    return shared_response(responses, status_code, data, outcome)
+
+
+def shared_response(responses, status_code, data, outcome):
+    """
+    ``X-Coalesced: 1`` only marks a result shared with a computation that was
+    in flight. A result an earlier, finished request left in the cache is an
+    ordinary ``X-Cache: HIT``.
+    """
+    response = responses[0] if responses else Response(data, status=status_code)
+    response['X-Coalesced'] = '1' if outcome == COALESCED else '0'
+    if outcome == CACHED:
+        response['X-Cache'] = 'HIT'
+    return response
@@ -0,0 +1,111 @@
+from hashlib import md5
+
+from django.db.models import Max
+from .cache import get_generations, normalized_list, normalized_query
+from .fields import wants_employees
+from .models import Company, Employee
+
+
+
+
+def representation_key(request):
+    """The parts of a request, besides the row state, that change the response body."""
+    return '|'.join([
+        request.META.get('HTTP_ACCEPT', ''),
+        request.GET.get('format', ''),
+        request.GET.get('with_employees', ''),
+        normalized_list(request.GET.get('fields', '')),
+    ])
+
+
+def make_etag(*parts, weak=False):
+    digest = md5('|'.join(map(str, parts)).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def cached_validators(request, key, compute):
+    cache = request.__dict__.setdefault('_conditional_validators', {})
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+
+
+def company_validators(request, pk):
+    def compute():
+        row = Company.objects.filter(pk=pk).values_list('version', 'updated_at').first()
+        if row is None:
+            return None, None
+
+        version, last_modified = row
+        parts = ['company', pk, version, last_modified.isoformat(), representation_key(request)]
+        if wants_employees(request):
+            employees_modified = Employee.objects.filter(company_id=pk).aggregate(modified=Max('updated_at'))['modified']
+            if employees_modified:
+                parts.append(employees_modified.isoformat())
+                last_modified = max(last_modified, employees_modified)
+        return make_etag(*parts), last_modified
+
+    return cached_validators(request, ('company', pk), compute)
+
+
+def company_etag(request, pk):
+    return company_validators(request, pk)[0]
+
+
+def company_last_modified(request, pk):
+    return company_validators(request, pk)[1]
+
+
+def employee_validators(request, pk):
+    def compute():
+        row = (
+            Employee.objects.filter(pk=pk)
+            .values_list('version', 'updated_at', 'company__version', 'company__updated_at')
+            .first()
+        )
+        if row is None:
+            return None, None
+
+        version, last_modified, company_version, company_modified = row
+        etag = make_etag(
+            'employee', pk, version, last_modified.isoformat(), company_version, company_modified.isoformat(),
+            representation_key(request)
+        )
+        return etag, max(last_modified, company_modified)
+
+    return cached_validators(request, ('employee', pk), compute)
+
+
+def employee_etag(request, pk):
+    return employee_validators(request, pk)[0]
+
+
+def employee_last_modified(request, pk):
+    return employee_validators(request, pk)[1]
+
+
+
+
+# Every list endpoint reads both models; their cache keys use the same labels.
+LIST_LABELS = ['api.company', 'api.employee']
+
+
+def list_etag(request):
+    """
+    Weak ETag for the list endpoints, built from what their response cache key
+    uses: the generation of each model they read and the normalized query.
+    Every write bumps a generation, so a list is validated without a query,
+    and a cache hit stays a cache hit.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+
+    def compute():
+        return make_etag(
+            request.path, normalized_query(request), representation_key(request), *get_generations(LIST_LABELS),
+            weak=True
+        )
+
+    return cached_validators(request, ('list',), compute)
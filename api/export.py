@@ -0,0 +1,76 @@
+import csv
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+from .models import Employee
+
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+COMPANY_EXPORT_FIELDS = ['id', 'name', 'address', 'phone', 'description', 'employee_count']
+EMPLOYEE_EXPORT_FIELDS = ['id', 'name', 'email', 'job_title', 'age', 'company_id', 'company__name']
+EMPLOYEE_CSV_COLUMNS = ['id', 'name', 'email', 'job_title', 'age', 'company_id', 'company_name']
+
+
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+
+
+def employee_rows(queryset, nested=True):
+    for row in queryset.values(*EMPLOYEE_EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        company_name = row.pop('company__name')
+        if nested:
+            row['company'] = {'id': row.pop('company_id'), 'name': company_name}
+        else:
+            row['company_name'] = company_name
+        yield row
+
+
+def company_rows(queryset, with_employees=False):
+    companies = queryset.values(*COMPANY_EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if not with_employees:
+        yield from companies
+        return
+
+    while chunk := list(islice(companies, EXPORT_CHUNK_SIZE)):
+        employees_map = {}
+        employees = (
+            Employee.objects.filter(company_id__in=[company['id'] for company in chunk])
+            .order_by()
+            .values('company_id', 'id', 'name', 'job_title')
+        )
+        for employee in employees.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            employees_map.setdefault(employee.pop('company_id'), []).append(employee)
+
+        for company in chunk:
+            company['employees'] = employees_map.get(company['id'], [])
+            yield company
+
+
+def ndjson_lines(rows):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+def csv_lines(rows, columns):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row[column] for column in columns])
+
+
+def streaming_export(lines, export_format, filename):
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -0,0 +1,61 @@
+from rest_framework import status
+from rest_framework.response import Response
+from .models import Employee
+
+
+COMPANY_FIELDS = ['id', 'name', 'address', 'phone', 'description', 'employee_count']
+EMPLOYEE_FIELDS = ['id', 'name', 'email', 'job_title', 'age', 'company']
+
+
+
+
+def parse_fields(request):
+    fields = request.GET.get('fields', '')
+    return list(dict.fromkeys(field.strip() for field in fields.split(',') if field.strip()))
+
+
+def requested_fields(request, default_fields, extra_fields=()):
+    """
+    The fields listed in ``?fields=id,name``, or ``default_fields`` when the
+    parameter is missing. Returns ``(fields, error_response)``. The fields
+    come back in the order of ``default_fields`` and ``extra_fields``,
+    whatever order they were requested in.
+    """
+    fields = parse_fields(request)
+    if not fields:
+        return list(default_fields), None
+
+    valid_fields = [*default_fields, *extra_fields]
+    invalid = [field for field in fields if field not in valid_fields]
+    if invalid:
+        return None, Response(
+            {"error": f"The submitted fields ({', '.join(invalid)}) are invalid! Use any of: {valid_fields}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return [field for field in valid_fields if field in fields], None
+
+
+def wants_employees(request):
+    return request.GET.get('with_employees') == '1' or 'employees' in parse_fields(request)
+
+
+def only_columns(model, fields, ordering=None):
+    """
+    The columns to load for ``fields``. The primary key and the ordering field
+    are always loaded, because keyset cursors are built from them.
+    """
+    concrete = {field.name for field in model._meta.concrete_fields}
+    columns = ['id', *(field for field in fields if field in concrete and field != 'id')]
+
+    ordering_field = (ordering or '').lstrip('-')
+    if ordering_field in concrete and ordering_field not in columns:
+        columns.append(ordering_field)
+    return columns
+
+
+def employee_queryset(fields, ordering=None):
+    """Employees loading only what ``fields`` renders; the company is joined only when it is requested."""
+    columns = only_columns(Employee, fields, ordering)
+    if 'company' in fields:
+        return Employee.objects.select_related('company').only(*columns, 'company__name')
+    return Employee.objects.only(*columns)
@@ -0,0 +1,92 @@
+from django.db.models import Q
+from .models import Company, Employee
+from .search import apply_search
+
+
+COMPANY_ORDERING_FIELDS = ['name', 'address', 'phone', 'description', 'employee_count']
+EMPLOYEE_ORDERING_FIELDS = ['name', 'email', 'job_title', 'age', 'company']
+
+COMPANY_SUBSTRING_FILTERS = {
+    'name': 'name',
+    'address': 'address',
+    'phone': 'phone',
+    'description': 'description',
+}
+
+EMPLOYEE_SUBSTRING_FILTERS = {
+    'name': 'name',
+    'email': 'email',
+    'company_name': 'company__name',
+}
+
+
+
+
+def apply_substring_filters(queryset, params, substring_filters):
+    for param, field in substring_filters.items():
+        value = params.get(param, None)
+        if value:
+            queryset = queryset.filter(**{f'{field}__trigram_contains': value})
+    return queryset
+
+
+def matching_job_titles(value):
+    """
+    The job titles containing ``value``. job_title only stores choice values, so
+    the substring match is resolved here and the query becomes an indexable IN.
+    """
+    return [choice for choice, _ in Employee.JOB_TITLES if value.lower() in choice.lower()]
+
+
+def filter_companies(queryset, params):
+    queryset = apply_substring_filters(queryset, params, COMPANY_SUBSTRING_FILTERS)
+
+    employees = params.get('employees', None)
+    if employees:
+        queryset = queryset.filter(employee_count=int(employees))
+    return queryset
+
+
+def filter_employees(queryset, params):
+    queryset = apply_substring_filters(queryset, params, EMPLOYEE_SUBSTRING_FILTERS)
+
+    job_title = params.get('job_title', None)
+    age = params.get('age', None)
+
+    if job_title:
+        queryset = queryset.filter(job_title__in=matching_job_titles(job_title))
+    if age:
+        queryset = queryset.filter(age=age)
+    return queryset
+
+
+def search_companies(queryset, search):
+    return apply_search(queryset, search)
+
+
+def matching_company_ids(search):
+    return Company.objects.filter(name__trigram_contains=search).values_list('id', flat=True)
+
+
+def search_employees_of(queryset, search, company_ids):
+    """
+    The document match OR-ed with the employees of the companies whose name
+    matches. The company IDs are resolved up front: OR-ed with an
+    ``IN (SELECT ...)`` the full text match can only run as a sequential
+    scan, while a list of IDs lets both sides use their index.
+    """
+    return apply_search(queryset, search, Q(company_id__in=company_ids))
+
+
+def search_employees(queryset, search):
+    return search_employees_of(queryset, search, list(matching_company_ids(search)))
+
+
+async def asearch_employees(queryset, search):
+    return search_employees_of(queryset, search, [company_id async for company_id in matching_company_ids(search)])
+
+
+def order_queryset(queryset, ordering, search=None):
+    if search:
+        return queryset.order_by('-search_rank', ordering)
+    return queryset.order_by(ordering)
@@ -0,0 +1,190 @@
+"""
+Per-request SQL instrumentation.
+
+SQLInstrumentationMiddleware counts the queries of every request and times
+them, together with serialization (read_data) and rendering. The numbers are
+sent back as ``Server-Timing`` and ``X-Query-Count`` headers, and requests
+slower than SLOW_REQUEST_MS are written to the ``api.slow_requests`` log as
+one JSON object per line, with their SQL.
+
+The query recorder is installed on each database connection as an execute
+wrapper and finds the current request through a context variable, so it also
+sees the queries the async views run in worker threads. With
+SQL_INSTRUMENTATION off the middleware removes itself from the chain and the
+recorder is never installed.
+
+Streaming responses (the exports) are measured up to the first byte: their
+queries run while the body is sent, after the middleware has returned.
+"""
+from contextvars import ContextVar
+from functools import wraps
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+slow_request_logger = logging.getLogger('api.slow_requests')
+
+current_metrics = ContextVar('request_metrics', default=None)
+
+
+
+
+class RequestMetrics:
+    __slots__ = ['started', 'query_count', 'db_time', 'queries', 'spans', 'max_queries']
+
+    def __init__(self, max_queries):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.queries = []
+        self.spans = {}
+        self.max_queries = max_queries
+
+    def add_query(self, sql, duration, many):
+        self.query_count += 1
+        self.db_time += duration
+        if len(self.queries) < self.max_queries:
+            self.queries.append((sql, duration, many))
+
+    def add_span(self, name, duration):
+        self.spans[name] = self.spans.get(name, 0.0) + duration
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - started, many)
+
+
+def install_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def timed(name):
+    """Add the run time of the decorated function to the current request's ``name`` timing."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = current_metrics.get()
+            if metrics is None:
+                return func(*args, **kwargs)
+
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.add_span(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+
+
+def milliseconds(seconds):
+    return round(seconds * 1000, 2)
+
+
+class SQLInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.headers = getattr(settings, 'SQL_INSTRUMENTATION_HEADERS', True)
+        self.slow_request_seconds = getattr(settings, 'SLOW_REQUEST_MS', 500) / 1000
+        self.max_queries = getattr(settings, 'SLOW_REQUEST_MAX_QUERIES', 100)
+
+        connection_created.connect(install_recorder, dispatch_uid='api.instrumentation')
+        for connection in connections.all(initialized_only=True):
+            install_recorder(connection)
+
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics(self.max_queries)
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics(self.max_queries)
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_template_response(self, request, response):
+        """DRF responses are rendered after the view returns; time that as ``render``."""
+        metrics = current_metrics.get()
+        if metrics is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                metrics.add_span('render', time.perf_counter() - started)
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, metrics):
+        total = metrics.elapsed()
+
+        if self.headers:
+            timings = [f'db;dur={milliseconds(metrics.db_time)};desc="{metrics.query_count} queries"']
+            timings += [f'{name};dur={milliseconds(duration)}' for name, duration in metrics.spans.items()]
+            timings.append(f'total;dur={milliseconds(total)}')
+            response['Server-Timing'] = ', '.join(timings)
+            response['X-Query-Count'] = str(metrics.query_count)
+
+        if total >= self.slow_request_seconds:
+            log_slow_request(request, response, metrics, total)
+        return response
+
+
+def log_slow_request(request, response, metrics, total):
+    """The SQL is logged without its parameters, which may hold personal data."""
+    slow_request_logger.warning(json.dumps({
+        'method': request.method,
+        'path': request.path,
+        'query_string': request.META.get('QUERY_STRING', ''),
+        'status': response.status_code,
+        'duration_ms': milliseconds(total),
+        'db_ms': milliseconds(metrics.db_time),
+        'query_count': metrics.query_count,
+        **{f'{name}_ms': milliseconds(duration) for name, duration in metrics.spans.items()},
+        'queries': [
+            {'sql': sql, 'duration_ms': milliseconds(duration), **({'many': True} if many else {})}
+            for sql, duration, many in metrics.queries
+        ],
+        'queries_truncated': metrics.query_count > len(metrics.queries),
+    }, ensure_ascii=False))
@@ -0,0 +1,109 @@
+from datetime import timedelta
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+from .bulk import create_employees, delete_employees, update_employees
+from .models import BulkJob
+from .routers import use_primary
+
+
+logger = logging.getLogger(__name__)
+
+JOB_CHUNK_SIZE = 1000
+JOB_STALE_AFTER = timedelta(minutes=5)
+
+RESULT_KEYS = {
+    'CREATE': 'created',
+    'DELETE': 'deleted',
+    'PUT': 'updated',
+    'PATCH': 'updated',
+}
+
+
+
+
+def apply_chunk(action, rows):
+    """Apply one chunk of a job. Valid rows are written, invalid rows come back as ``(index, detail)``."""
+    context = {'bulk': True}
+
+    if action == 'CREATE':
+        return create_employees(rows, context, all_or_nothing=False)
+
+    if action == 'DELETE':
+        employee_ids = [data.get('id') if isinstance(data, dict) else None for data in rows]
+        deleted_count, non_existing_ids = delete_employees([employee_id for employee_id in employee_ids if employee_id])
+        missing = set(map(str, non_existing_ids))
+        errors = [
+            (index, {'error': f'Employee ID {employee_id} not found.' if employee_id else 'Each deletion must include an ID.'})
+            for index, employee_id in enumerate(employee_ids)
+            if not employee_id or str(employee_id) in missing
+        ]
+        return deleted_count, errors
+
+    return update_employees(rows, context, partial=action == 'PATCH', all_or_nothing=False)
+
+
+class JobTakenOver(Exception):
+    """Another worker claimed the job, so this one must stop writing to it."""
+
+
+def run_job(job, chunk_size=JOB_CHUNK_SIZE):
+    """
+    Work through a claimed job chunk by chunk. Every chunk commits together
+    with the job's progress, so a job taken over from a dead worker resumes
+    where the last commit left it.
+
+    The progress is only saved while the job is still ours and still at the
+    chunk's start. A slow worker whose job was taken over rolls its chunk back
+    and stops, instead of applying rows the new worker applies as well.
+
+    The worker has no request to pin it, so its reads are sent to the primary
+    explicitly: a lagging replica would reject companies created just before
+    the job and miss emails taken just before it.
+    """
+    result_key = RESULT_KEYS[job.action]
+    owned = BulkJob.objects.filter(pk=job.pk, worker=job.worker)
+
+    try:
+        with use_primary():
+            while job.processed < job.total:
+                start = job.processed
+                rows = job.payload[start:start + chunk_size]
+
+                with transaction.atomic():
+                    count, errors = apply_chunk(job.action, rows)
+
+                    job.result[result_key] = job.result.get(result_key, 0) + count
+                    job.result['failed'] = job.result.get('failed', 0) + len(errors)
+                    job.errors.extend({'row': start + index, 'errors': detail} for index, detail in errors)
+                    job.processed = start + len(rows)
+                    job.heartbeat_at = timezone.now()
+                    saved = owned.filter(processed=start).update(
+                        result=job.result, errors=job.errors, processed=job.processed, heartbeat_at=job.heartbeat_at
+                    )
+                    if not saved:
+                        raise JobTakenOver
+
+    except JobTakenOver:
+        logger.warning("Bulk job %s was taken over by another worker, stopping", job.id)
+        job.refresh_from_db()
+        return job
+    except Exception as e:
+        logger.exception("Bulk job %s failed", job.id)
+        job.status = 'failed'
+        job.failure = str(e)
+    else:
+        job.status = 'succeeded'
+
+    job.finished_at = timezone.now()
+    owned.update(status=job.status, failure=job.failure, finished_at=job.finished_at)
+    return job
+
+
+def run_pending_jobs(worker, chunk_size=JOB_CHUNK_SIZE, stale_after=JOB_STALE_AFTER):
+    processed = 0
+    while (job := BulkJob.objects.claim(worker, stale_after)) is not None:
+        run_job(job, chunk_size=chunk_size)
+        processed += 1
+    return processed
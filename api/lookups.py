@@ -0,0 +1,24 @@
+from django.db.models import CharField
+from django.db.models.lookups import IContains
+
+
+
+
+@CharField.register_lookup
+class TrigramContains(IContains):
+    """
+    Case-insensitive substring match that a ``gin_trgm_ops`` index can serve.
+
+    On PostgreSQL this compiles to a bare ``col ILIKE '%value%'`` (``icontains``
+    wraps the column in ``UPPER()``, which the trigram indexes do not cover).
+    Every other backend gets the plain ``icontains`` LIKE query.
+    """
+    lookup_name = 'trigram_contains'
+
+    def as_sql(self, compiler, connection):
+        return IContains(self.lhs, self.rhs).as_sql(compiler, connection)
+
+    def as_postgresql(self, compiler, connection):
+        lhs_sql, lhs_params = self.process_lhs(compiler, connection)
+        rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs_sql} ILIKE {rhs_sql}', (*lhs_params, *rhs_params)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from api.models import Company
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored Company.employee_count column and report any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drifted companies, do not fix them.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted = list(
+                Company.objects.select_for_update()
+                .annotate(actual_count=Company.objects.actual_employee_count())
+                .exclude(employee_count=F('actual_count'))
+                .values_list('id', 'employee_count', 'actual_count')
+            )
+
+            for company_id, stored, actual in drifted:
+                self.stdout.write(f"{company_id}: stored {stored}, actual {actual}")
+
+            if drifted and not options['dry_run']:
+                Company.objects.filter(id__in=[company_id for company_id, _, _ in drifted]).recount_employees()
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("All employee counts are up to date."))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{len(drifted)} companies have drifted employee counts."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(drifted)} companies reconciled."))
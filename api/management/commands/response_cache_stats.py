@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from api.cache import cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Report the hit/miss and request coalescing statistics of the versioned response cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Reset the counters after reporting them.")
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        self.stdout.write(f"hits: {stats['hits']}, misses: {stats['misses']}, hit ratio: {stats['hit_ratio']:.2%}")
+        self.stdout.write(f"coalesced requests: {stats['coalesced']}")
+
+        if options['reset']:
+            reset_cache_stats()
+            self.stdout.write(self.style.SUCCESS("Response cache statistics reset."))
@@ -0,0 +1,33 @@
+from datetime import timedelta
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from api.jobs import JOB_CHUNK_SIZE, JOB_STALE_AFTER, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued bulk employee jobs. Start several of these to process jobs in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty instead of polling.")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--chunk-size', type=int, default=JOB_CHUNK_SIZE, help="Rows applied per transaction.")
+        parser.add_argument(
+            '--stale-after', type=int, default=int(JOB_STALE_AFTER.total_seconds()),
+            help="Seconds without a heartbeat after which a running job is taken over."
+        )
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        stale_after = timedelta(seconds=options['stale_after'])
+        self.stdout.write(f"Bulk job worker {worker} started.")
+
+        while True:
+            processed = run_pending_jobs(worker, chunk_size=options['chunk_size'], stale_after=stale_after)
+            if processed:
+                self.stdout.write(f"{processed} jobs processed.")
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
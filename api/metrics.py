@@ -0,0 +1,351 @@
+"""
+Request metrics shared by every worker process.
+
+Each process adds its samples to its own memory-mapped file in METRICS_DIR
+(``metrics-<pid>.db``), so workers never contend with each other. A
+request's samples are written under a single per-process lock, which is
+only ever contended by the threads of that process. The scrape endpoint
+reads every file in the directory and reports the totals.
+
+File layout: an 8 byte header holding the number of used bytes, then
+entries of ``<uint32 key length><utf-8 key, padded to 8 bytes><float64>``.
+A new entry is written before the header is moved past it, so a reader
+never sees a half-written key.
+
+Under gunicorn (gunicorn.conf.py) the master empties the directory when it
+starts, and folds the file of every worker that exits into
+``metrics-archive.db``, so the counts of recycled workers stay in the totals
+while their files do not pile up.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from .instrumentation import current_metrics
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no advisory file locks on this platform
+    fcntl = None
+
+
+INITIAL_SIZE = 64 * 1024
+HEADER = struct.Struct('<Q')
+KEY_LENGTH = struct.Struct('<I')
+VALUE = struct.Struct('<d')
+ARCHIVE = 'metrics-archive.db'
+
+
+
+
+def padded(length):
+    return (length + 7) // 8 * 8
+
+
+def parse_entries(data):
+    """Yield ``(key, value, value_offset)`` for every entry of a metrics file."""
+    used = HEADER.unpack_from(data, 0)[0] if len(data) >= HEADER.size else 0
+    position = HEADER.size
+    while position < used:
+        length = KEY_LENGTH.unpack_from(data, position)[0]
+        key_start = position + KEY_LENGTH.size
+        value_offset = padded(key_start + length)
+        key = bytes(data[key_start:key_start + length]).decode('utf-8')
+        yield key, VALUE.unpack_from(data, value_offset)[0], value_offset
+        position = value_offset + VALUE.size
+
+
+class MetricsFile:
+    """One process's memory-mapped sample values."""
+
+    def __init__(self, path):
+        self.file = open(path, 'a+b')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < INITIAL_SIZE:
+            self.file.truncate(INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+        self.used = HEADER.unpack_from(self.map, 0)[0]
+        if self.used == 0:
+            self.used = HEADER.size
+            HEADER.pack_into(self.map, 0, self.used)
+        self.positions = {key: offset for key, _, offset in parse_entries(self.map)}
+
+    def allocate(self, key):
+        encoded = key.encode('utf-8')
+        value_offset = padded(self.used + KEY_LENGTH.size + len(encoded))
+        end = value_offset + VALUE.size
+        if end > len(self.map):
+            self.grow(end)
+
+        KEY_LENGTH.pack_into(self.map, self.used, len(encoded))
+        self.map[self.used + KEY_LENGTH.size:self.used + KEY_LENGTH.size + len(encoded)] = encoded
+        VALUE.pack_into(self.map, value_offset, 0.0)
+        HEADER.pack_into(self.map, 0, end)
+
+        self.used = end
+        self.positions[key] = value_offset
+        return value_offset
+
+    def grow(self, needed):
+        size = len(self.map)
+        while size < needed:
+            size *= 2
+        self.map.close()
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    def add(self, key, amount):
+        offset = self.positions.get(key)
+        if offset is None:
+            offset = self.allocate(key)
+        VALUE.pack_into(self.map, offset, VALUE.unpack_from(self.map, offset)[0] + amount)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def metrics_dir():
+    return Path(getattr(settings, 'METRICS_DIR', None) or Path(settings.BASE_DIR) / 'cache' / 'metrics')
+
+
+def store():
+    """This process's metrics file. Opened lazily, and again after a fork."""
+    global _store
+    pid = os.getpid()
+    if _store is None or _store[0] != pid or _store[1] != metrics_dir():
+        with _store_lock:
+            directory = metrics_dir()
+            if _store is None or _store[0] != pid or _store[1] != directory:
+                directory.mkdir(parents=True, exist_ok=True)
+                _store = (pid, directory, MetricsFile(directory / f'metrics-{pid}.db'), threading.Lock())
+    return _store
+
+
+def write(samples):
+    """Add every ``(key, amount)`` of ``samples`` to this process's file in one locked section."""
+    _, _, metrics_file, lock = store()
+    with lock:
+        for key, amount in samples:
+            metrics_file.add(key, amount)
+
+
+@contextmanager
+def directory_lock(exclusive):
+    """Scrapes share the directory; archiving a file excludes them, so no count is read twice or missed."""
+    directory = metrics_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / 'metrics.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_totals():
+    """The sum of every sample over all the processes' files."""
+    totals = {}
+    with directory_lock(exclusive=False) if fcntl else nullcontext():
+        for path in sorted(metrics_dir().glob('metrics-*.db')):
+            try:
+                data = path.read_bytes()
+            except FileNotFoundError:
+                continue
+            for key, value, _ in parse_entries(data):
+                totals[key] = totals.get(key, 0.0) + value
+    return totals
+
+
+def archive_process(pid):
+    """Add the samples of an exited worker to the archive file and remove its own file."""
+    path = metrics_dir() / f'metrics-{pid}.db'
+    if not path.exists():
+        return
+
+    with directory_lock(exclusive=True) if fcntl else nullcontext():
+        archive = MetricsFile(metrics_dir() / ARCHIVE)
+        try:
+            for key, value, _ in parse_entries(path.read_bytes()):
+                archive.add(key, value)
+        finally:
+            archive.close()
+        path.unlink()
+
+
+def clear():
+    """Remove every metrics file. The counters start again with the server."""
+    for path in metrics_dir().glob('metrics-*.db'):
+        path.unlink(missing_ok=True)
+
+
+
+
+def sample_key(name, labels):
+    return json.dumps([name, sorted(labels.items())], ensure_ascii=False)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+
+    def samples(self, amount=1, **labels):
+        return [(sample_key(self.name, labels), amount)]
+
+
+class Histogram:
+    """Bucket counts are stored per bucket and made cumulative when exported."""
+    kind = 'histogram'
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = sorted(buckets)
+
+    def samples(self, value, **labels):
+        samples = [(sample_key(f'{self.name}_count', labels), 1), (sample_key(f'{self.name}_sum', labels), value)]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            samples.append((sample_key(f'{self.name}_bucket', {**labels, 'le': format_value(self.buckets[index])}), 1))
+        return samples
+
+
+REQUESTS = Counter('http_requests_total', 'Requests handled, by URL name, method and status code.')
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent handling the request, by URL name.',
+    [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL queries per request, by URL name.',
+    [0, 1, 2, 3, 5, 10, 20, 50, 100, 500]
+)
+BULK_BATCH_SIZE = Histogram(
+    'bulk_batch_size', 'Rows submitted per bulk request, by URL name and action.',
+    [1, 10, 50, 100, 500, 1000, 5000, 10000, 50000]
+)
+METRICS = [REQUESTS, REQUEST_LATENCY, REQUEST_QUERIES, BULK_BATCH_SIZE]
+
+
+
+
+def url_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.url_name if match and match.url_name else 'unmatched'
+
+
+def observe_bulk_batch(request, action, size):
+    if getattr(settings, 'METRICS', False):
+        write(BULK_BATCH_SIZE.samples(size, view=url_name(request), action=action))
+
+
+class MetricsMiddleware:
+    """
+    Counts every request and observes its latency and, when
+    SQLInstrumentationMiddleware runs around it, its query count.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS', False):
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started)
+        return response
+
+    def observe(self, request, response, duration):
+        view = url_name(request)
+        samples = REQUESTS.samples(view=view, method=request.method, status=response.status_code)
+        samples += REQUEST_LATENCY.samples(duration, view=view)
+
+        request_metrics = current_metrics.get()
+        if request_metrics is not None:
+            samples += REQUEST_QUERIES.samples(request_metrics.query_count, view=view)
+        write(samples)
+
+
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def exposition(totals):
+    """The totals in the Prometheus text format (version 0.0.4)."""
+    samples = {}
+    for key, value in totals.items():
+        name, labels = json.loads(key)
+        samples.setdefault(name, []).append((tuple(map(tuple, labels)), value))
+
+    lines = []
+    for metric in METRICS:
+        lines += [f'# HELP {metric.name} {metric.description}', f'# TYPE {metric.name} {metric.kind}']
+        if metric.kind == 'counter':
+            for labels, value in sorted(samples.get(metric.name, [])):
+                lines.append(f'{metric.name}{format_labels(labels)} {format_value(value)}')
+            continue
+
+        buckets = {}
+        for labels, value in samples.get(f'{metric.name}_bucket', []):
+            le = dict(labels)['le']
+            buckets[(tuple(label for label in labels if label[0] != 'le'), le)] = value
+        sums = dict(samples.get(f'{metric.name}_sum', []))
+
+        for labels, count in sorted(samples.get(f'{metric.name}_count', [])):
+            cumulative = 0.0
+            for bound in metric.buckets:
+                le = format_value(bound)
+                cumulative += buckets.get((labels, le), 0.0)
+                lines.append(f'{metric.name}_bucket{format_labels(sorted([*labels, ("le", le)]))} {format_value(cumulative)}')
+            lines.append(f'{metric.name}_bucket{format_labels(sorted([*labels, ("le", "+Inf")]))} {format_value(count)}')
+            lines.append(f'{metric.name}_sum{format_labels(labels)} {format_value(sums.get(labels, 0.0))}')
+            lines.append(f'{metric.name}_count{format_labels(labels)} {format_value(count)}')
+    return '\n'.join(lines) + '\n'
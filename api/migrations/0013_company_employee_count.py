@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:07
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_employee_count(apps, schema_editor):
+    Company = apps.get_model('api', 'Company')
+    Employee = apps.get_model('api', 'Employee')
+    alias = schema_editor.connection.alias
+
+    employee_counts = (
+        Employee.objects.using(alias).filter(company=OuterRef('pk'))
+        .order_by()
+        .values('company')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    Company.objects.using(alias).update(employee_count=Coalesce(Subquery(employee_counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_alter_employee_company'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='employee_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_employee_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+TRIGRAM_INDEXES = [
+    ('api_company_name_trgm', 'api_company', 'name'),
+    ('api_company_address_trgm', 'api_company', 'address'),
+    ('api_company_phone_trgm', 'api_company', 'phone'),
+    ('api_company_description_trgm', 'api_company', 'description'),
+    ('api_employee_name_trgm', 'api_employee', 'name'),
+    ('api_employee_email_trgm', 'api_employee', 'email'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index_name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {table} USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for index_name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index_name}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0013_company_employee_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
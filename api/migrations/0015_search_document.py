@@ -0,0 +1,82 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:12
+
+import re
+
+from django.db import migrations, models
+
+
+# Copied from api/search.py as they were when this migration was written, so
+# that later changes there do not change what it does.
+SEARCH_CONFIG = 'simple'
+
+SEARCH_FIELDS = {
+    'Company': ['id', 'name', 'address', 'phone', 'description'],
+    'Employee': ['id', 'name', 'email', 'job_title', 'age'],
+}
+
+
+def build_search_document(instance, fields):
+    text = ' '.join(str(value) for value in (getattr(instance, field) for field in fields) if value not in (None, '')).lower()
+    words = re.sub(r'[\W_]+', ' ', text).strip()
+    return f'{text} {words}' if words and words != text else text
+
+
+def backfill_search_documents(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    for model_name, fields in SEARCH_FIELDS.items():
+        model = apps.get_model('api', model_name)
+        batch = []
+        for instance in model.objects.using(alias).only(*fields).iterator(chunk_size=2000):
+            instance.search_document = build_search_document(instance, fields)
+            batch.append(instance)
+            if len(batch) == 2000:
+                model.objects.using(alias).bulk_update(batch, ['search_document'])
+                batch = []
+        model.objects.using(alias).bulk_update(batch, ['search_document'])
+
+
+def create_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for table in ['api_company', 'api_employee']:
+        schema_editor.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('{SEARCH_CONFIG}', search_document)) STORED"
+        )
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {table}_search_vector ON {table} USING gin (search_vector)'
+        )
+
+
+def drop_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for table in ['api_company', 'api_employee']:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {table}_search_vector')
+        schema_editor.execute(f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0014_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='search_document',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='search_document',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_vectors, drop_search_vectors),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    CREATE INDEX CONCURRENTLY on PostgreSQL, so the tables stay writable while
+    the indexes build. Other backends create them the usual way.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0017_row_versions'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='company',
+            index=models.Index(fields=['name', 'id'], name='api_company_name_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='company',
+            index=models.Index(fields=['address', 'id'], name='api_company_address_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='company',
+            index=models.Index(fields=['phone', 'id'], name='api_company_phone_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='company',
+            index=models.Index(fields=['description', 'id'], name='api_company_description_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='company',
+            index=models.Index(fields=['employee_count', 'id'], name='api_company_emp_count_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='employee',
+            index=models.Index(fields=['company', 'id'], include=('name', 'job_title'), name='api_employee_company_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='employee',
+            index=models.Index(fields=['name', 'id'], name='api_employee_name_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='employee',
+            index=models.Index(fields=['job_title', 'id'], name='api_employee_job_title_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='employee',
+            index=models.Index(fields=['age', 'id'], name='api_employee_age_id_idx'),
+        ),
+        # The single column indexes are dropped once the composite indexes that
+        # replace them exist.
+        migrations.AlterField(
+            model_name='company',
+            name='employee_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='employee',
+            name='company',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='employees', to='api.company'),
+        ),
+    ]
@@ -1,11 +1,120 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
 import uuid
 from django.core.validators import EmailValidator, RegexValidator
+from .search import build_search_document
+from .cache import bump_generations
 
 
 
 
-class Company(models.Model):
+class VersionedQuerySet(models.QuerySet):
+    """
+    Bumps the model's response cache generation on every bulk write path that
+    bypasses Model.save() and Model.delete().
+    """
+
+    def bump_generations(self, *labels):
+        bump_generations(self.model._meta.label_lower, *labels, using=self.db)
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        self.bump_generations()
+        return rows
+
+    def delete(self):
+        result = super().delete()
+        self.bump_generations(*(label.lower() for label in result[1]))
+        return result
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self.bump_generations()
+        return objs
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        rows = super().bulk_update(objs, fields, batch_size=batch_size)
+        self.bump_generations()
+        return rows
+
+
+
+
+class CompanyQuerySet(VersionedQuerySet):
+    def adjust_employee_counts(self, deltas):
+        deltas = {company_id: delta for company_id, delta in deltas.items() if company_id and delta}
+        if not deltas:
+            return 0
+
+        return self.filter(pk__in=deltas.keys()).update(
+            employee_count=F('employee_count') + Case(
+                *[When(pk=company_id, then=Value(delta)) for company_id, delta in deltas.items()],
+                default=Value(0),
+                output_field=IntegerField()
+            ),
+            version=F('version') + 1,
+            updated_at=timezone.now()
+        )
+
+    @staticmethod
+    def actual_employee_count():
+        employee_counts = (
+            Employee.objects.filter(company=OuterRef('pk'))
+            .order_by()
+            .values('company')
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        return Coalesce(Subquery(employee_counts), 0)
+
+    def recount_employees(self):
+        return self.update(employee_count=self.actual_employee_count(), version=F('version') + 1, updated_at=timezone.now())
+
+
+
+
+class VersionedModel(models.Model):
+    """
+    Adds a row version and modification time that every write path bumps.
+    They back the ETag and Last-Modified headers of the detail endpoints.
+    """
+    version = models.PositiveIntegerField(default = 1, editable = False)
+    updated_at = models.DateTimeField(auto_now = True, db_index = True)
+
+    class Meta:
+        abstract = True
+
+    def bump_version(self):
+        self.version += 1
+        self.updated_at = timezone.now()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version', 'updated_at'}
+
+        if self._state.adding:
+            super().save(*args, **kwargs)
+        else:
+            # Incremented in the UPDATE itself, so concurrent saves of a row never
+            # share a version. The row stays locked until the new one is read back.
+            self.version = F('version') + 1
+            with transaction.atomic(using = kwargs.get('using')):
+                super().save(*args, **kwargs)
+                self.refresh_from_db(fields = ['version'])
+        bump_generations(self._meta.label_lower, using=kwargs.get('using'))
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_generations(self._meta.label_lower, *(label.lower() for label in result[1]), using=kwargs.get('using'))
+        return result
+
+
+
+
+class Company(VersionedModel):
     id = models.UUIDField(primary_key = True, default = uuid.uuid4, editable = False)
     name = models.CharField(max_length = 100, null = False, blank = False)
     
@@ -24,6 +133,33 @@ class Company(models.Model):
     
     description = models.CharField(max_length = 200, blank = True, null = True)
 
+    employee_count = models.PositiveIntegerField(default = 0, editable = False)
+
+    search_document = models.TextField(default = '', editable = False)
+
+    SEARCH_FIELDS = ['id', 'name', 'address', 'phone', 'description']
+
+    objects = CompanyQuerySet.as_manager()
+
+    class Meta:
+        # Every list ordering is paginated on (field, id), see KeysetPagination.
+        indexes = [
+            models.Index(fields = ['name', 'id'], name = 'api_company_name_id_idx'),
+            models.Index(fields = ['address', 'id'], name = 'api_company_address_id_idx'),
+            models.Index(fields = ['phone', 'id'], name = 'api_company_phone_id_idx'),
+            models.Index(fields = ['description', 'id'], name = 'api_company_description_id_idx'),
+            models.Index(fields = ['employee_count', 'id'], name = 'api_company_emp_count_id_idx'),
+        ]
+
+    def update_search_document(self):
+        self.search_document = build_search_document(self, self.SEARCH_FIELDS)
+
+    def save(self, *args, **kwargs):
+        self.update_search_document()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.SEARCH_FIELDS):
+            kwargs['update_fields'] = {*update_fields, 'search_document'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -31,7 +167,7 @@ class Company(models.Model):
 
 
 
-class Employee(models.Model):
+class Employee(VersionedModel):
     JOB_TITLES = [
         ('developer', 'Developer'),
         ('designer', 'Designer'),
@@ -57,8 +193,133 @@ class Employee(models.Model):
         related_name = "employees",
         on_delete = models.CASCADE,
         null = False,
-        blank = False
+        blank = False,
+        db_index = False
     )
 
+    search_document = models.TextField(default = '', editable = False)
+
+    SEARCH_FIELDS = ['id', 'name', 'email', 'job_title', 'age']
+
+    objects = VersionedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Replaces the plain foreign key index. The included columns make the
+            # with_employees lookup an index-only scan.
+            models.Index(fields = ['company', 'id'], include = ['name', 'job_title'], name = 'api_employee_company_id_idx'),
+            models.Index(fields = ['name', 'id'], name = 'api_employee_name_id_idx'),
+            models.Index(fields = ['job_title', 'id'], name = 'api_employee_job_title_id_idx'),
+            models.Index(fields = ['age', 'id'], name = 'api_employee_age_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_company_id = instance.__dict__.get('company_id')
+        return instance
+
+    def update_search_document(self):
+        self.search_document = build_search_document(self, self.SEARCH_FIELDS)
+
+    def save(self, *args, **kwargs):
+        self.update_search_document()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.SEARCH_FIELDS):
+            kwargs['update_fields'] = {*update_fields, 'search_document'}
+
+        adding = self._state.adding
+        previous_company_id = getattr(self, '_loaded_company_id', None)
+
+        with transaction.atomic(using = kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+            if adding:
+                Company.objects.adjust_employee_counts({self.company_id: 1})
+            elif previous_company_id and previous_company_id != self.company_id:
+                Company.objects.adjust_employee_counts({previous_company_id: -1, self.company_id: 1})
+
+        self._loaded_company_id = self.company_id
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using = kwargs.get('using')):
+            result = super().delete(*args, **kwargs)
+            # A concurrent delete of the same employee may have removed the row already.
+            Company.objects.adjust_employee_counts({self.company_id: -result[1].get(self._meta.label, 0)})
+        return result
+
+    def __str__(self):
+        return f"{self.name} ({self.job_title})"
+
+
+
+
+class BulkJobQuerySet(models.QuerySet):
+    def enqueue(self, action, rows):
+        return self.create(action = action, payload = rows, total = len(rows))
+
+    def claim(self, worker, stale_after):
+        """
+        Lock and take the oldest pending job, or a running one whose worker
+        stopped sending heartbeats. Concurrent workers skip each other's locked rows.
+        """
+        stale = timezone.now() - stale_after
+        with transaction.atomic():
+            job = (
+                self.select_for_update(skip_locked = True)
+                .filter(models.Q(status = 'pending') | models.Q(status = 'running', heartbeat_at__lt = stale))
+                .order_by('created_at')
+                .first()
+            )
+            if job is None:
+                return None
+
+            job.status = 'running'
+            job.worker = worker
+            job.started_at = job.started_at or timezone.now()
+            job.heartbeat_at = timezone.now()
+            job.save(update_fields = ['status', 'worker', 'started_at', 'heartbeat_at'])
+            return job
+
+
+
+
+class BulkJob(models.Model):
+    ACTIONS = [
+        ('CREATE', 'Create'),
+        ('DELETE', 'Delete'),
+        ('PUT', 'Put'),
+        ('PATCH', 'Patch'),
+    ]
+
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key = True, default = uuid.uuid4, editable = False)
+    action = models.CharField(max_length = 10, choices = ACTIONS)
+    status = models.CharField(max_length = 10, choices = STATUSES, default = 'pending')
+
+    payload = models.JSONField(default = list)
+    total = models.PositiveIntegerField(default = 0)
+    processed = models.PositiveIntegerField(default = 0)
+    result = models.JSONField(default = dict)
+    errors = models.JSONField(default = list)
+    failure = models.TextField(blank = True, default = '')
+
+    worker = models.CharField(max_length = 100, blank = True, default = '')
+    created_at = models.DateTimeField(auto_now_add = True)
+    started_at = models.DateTimeField(null = True, blank = True)
+    heartbeat_at = models.DateTimeField(null = True, blank = True)
+    finished_at = models.DateTimeField(null = True, blank = True)
+
+    objects = BulkJobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields = ['status', 'created_at'])]
+
     def __str__(self):
-        return f"{self.name} ({self.job_title})"
\ No newline at end of file
+        return f"{self.action} job {self.id} ({self.status})"
@@ -0,0 +1,313 @@
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from hashlib import md5
+import json
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from .cache import get_generations, response_cache
+
+
+EXACT_COUNT_THRESHOLD = 10000
+
+
+
+
+def planner_estimate(queryset):
+    """
+    Row estimate of the planner for ``queryset``, or None where it is not
+    available. An unfiltered table uses pg_class.reltuples; anything else uses
+    the top plan node of EXPLAIN.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    queryset = queryset.order_by()
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedPage(Page):
+    """A page whose successor is known from one extra row instead of from the count."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self.next_exists = has_next
+
+    def has_next(self):
+        return self.next_exists
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose ``count`` avoids an exact COUNT(*) over large result sets.
+
+    An exact count is reused from the response cache while the generations of
+    the tables it reads are unchanged. Otherwise, when the planner expects more
+    than EXACT_COUNT_THRESHOLD rows, its estimate is returned and ``estimated``
+    is set. Small results, backends without a planner estimate, and
+    ``exact=True`` fall back to an exact, cached COUNT(*).
+
+    An estimate is only reported as the ``count``; it never decides which pages
+    exist. Estimated pages are not bounded by ``num_pages``: each one fetches
+    ``per_page + 1`` rows to learn whether there is a next page, and a page
+    past the end of the data is empty.
+    """
+
+    def __init__(self, object_list, per_page, exact=False, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.exact = exact
+        self.estimated = False
+
+    def count_key(self):
+        sql, params = self.object_list.order_by().query.sql_with_params()
+        labels = sorted(
+            model._meta.label_lower for model in apps.get_models()
+            if model is self.object_list.model or model._meta.db_table in sql
+        )
+        digest = md5(f'{sql}|{params!r}'.encode(), usedforsecurity=False).hexdigest()
+        return f"count:{'.'.join(map(str, get_generations(labels)))}:{digest}"
+
+    @cached_property
+    def count(self):
+        cache = response_cache()
+        key = self.count_key()
+        count = cache.get(key)
+        if count is not None:
+            return count
+
+        if not self.exact:
+            estimate = planner_estimate(self.object_list)
+            if estimate is not None and estimate > EXACT_COUNT_THRESHOLD:
+                self.estimated = True
+                return estimate
+
+        count = self.object_list.count()
+        cache.set(key, count, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+        return count
+
+    def validate_number(self, number):
+        self.count  # decides whether the count is estimated
+        if not self.estimated:
+            return super().validate_number(number)
+
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.estimated:
+            return super().page(number)
+
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages['no_results'])
+        return EstimatedPage(rows[:self.per_page], number, self, has_next=len(rows) > self.per_page)
+
+
+
+
+class CustomPagination(PageNumberPagination):
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # Django's Paginator has no async API, so the count and the page slice run in a worker thread.
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+    def django_paginator_class(self, queryset, page_size):
+        exact = self.request.query_params.get(self.count_query_param) == 'exact'
+        return EstimatedCountPaginator(queryset, page_size, exact=exact)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'count_estimated': self.page.paginator.estimated,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor based pagination over ``(ordering field, id)``.
+
+    Each page is a single index-friendly range query, no COUNT(*) and no OFFSET,
+    so the cost of a page does not depend on how deep the client is. NULL values
+    are always sorted as the largest value, so the same rule holds on every backend.
+    """
+    page_size = CustomPagination.page_size
+    page_size_query_param = CustomPagination.page_size_query_param
+    max_page_size = CustomPagination.max_page_size
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def __init__(self, ordering):
+        self.descending = ordering.startswith('-')
+        self.ordering_field = ordering.lstrip('-')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.set_page([obj async for obj in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.attname = queryset.model._meta.get_field(self.ordering_field).attname
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = bool(self.cursor and self.cursor.get('r'))
+        descending = self.descending != self.reverse
+
+        if self.cursor:
+            value, pk = self.cursor_position(self.cursor, queryset.model)
+            queryset = queryset.filter(self.after_position(value, pk, descending))
+        queryset = queryset.order_by(*self.order_by(descending))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def order_by(self, descending):
+        if self.attname == 'id':
+            return [F('id').desc() if descending else F('id').asc()]
+        if descending:
+            return [F(self.attname).desc(nulls_first=True), F('id').desc()]
+        return [F(self.attname).asc(nulls_last=True), F('id').asc()]
+
+    def after_position(self, value, pk, descending):
+        if self.attname == 'id':
+            return Q(id__lt=pk) if descending else Q(id__gt=pk)
+
+        field = self.attname
+        if descending:
+            if value is None:
+                return Q(**{f'{field}__isnull': True, 'id__lt': pk}) | Q(**{f'{field}__isnull': False})
+            return Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+
+        if value is None:
+            return Q(**{f'{field}__isnull': True, 'id__gt': pk})
+        return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}) | Q(**{f'{field}__isnull': True})
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii'), altchars=b'-_', validate=True))
+            if not isinstance(cursor, dict) or 'v' not in cursor or 'id' not in cursor:
+                raise ValueError
+        except (BinasciiError, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def cursor_position(self, cursor, model):
+        """The cursor's ``(value, id)`` converted by the model's fields. A value they reject makes the cursor invalid."""
+        value, pk = cursor['v'], cursor['id']
+        try:
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, str))):
+                raise ValidationError('Invalid cursor value.')
+            if value is not None:
+                value = model._meta.get_field(self.ordering_field).to_python(value)
+            if pk is None:
+                raise ValidationError('Invalid cursor id.')
+            pk = model._meta.pk.to_python(pk)
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def encode_cursor(self, obj, reverse):
+        value = getattr(obj, self.attname)
+        if value is not None and not isinstance(value, (int, str)):
+            value = str(value)
+
+        position = {'v': value, 'id': str(obj.pk)}
+        if reverse:
+            position['r'] = 1
+        encoded = b64encode(json.dumps(position, separators=(',', ':')).encode(), altchars=b'-_').decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+
+
+def get_paginator(request, ordering):
+    if request.GET.get('pagination') == 'cursor' or request.GET.get(KeysetPagination.cursor_query_param):
+        return KeysetPagination(ordering)
+    return CustomPagination()
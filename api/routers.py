@@ -0,0 +1,107 @@
+"""
+Read replicas.
+
+ReplicaRouter sends reads to one of the DATABASE_REPLICAS and everything else
+to the primary (``default``). Reads stay on the primary when:
+
+* they run inside a transaction on the primary,
+* the request is a write (POST, PUT, PATCH, DELETE), so validation sees the
+  rows it is about to change,
+* the client wrote within the last REPLICA_PIN_SECONDS. PrimaryPinMiddleware
+  marks it with a cookie, so it reads its own writes while the replicas
+  catch up,
+* a cached list response is recomputed within REPLICA_PIN_SECONDS of a write
+  to its models (see api/cache.py), so a lagging replica cannot put a stale
+  page in the cache under the new generation. The write times are kept in
+  the REPLICA_PIN_CACHE_ALIAS cache, which every process must share.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+primary_pin = ContextVar('primary_pin', default=False)
+
+
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def use_primary(pin=True):
+    """Send the reads of the block to the primary (when ``pin`` is true)."""
+    token = primary_pin.set(primary_pin.get() or pin)
+    try:
+        yield
+    finally:
+        primary_pin.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or primary_pin.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        # A database cache may hold the write times that pin reads to the
+        # primary; a lagging replica would hide the latest ones.
+        if model._meta.app_label == 'django_cache':
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary.
+        return True
+
+
+
+
+class PrimaryPinMiddleware:
+    """
+    Pins writes, and the reads of a client that wrote recently, to the primary.
+    The pin is a cookie that expires after REPLICA_PIN_SECONDS.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.cookie = getattr(settings, 'REPLICA_PIN_COOKIE', 'db_primary')
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def pinned(self, request):
+        return request.method not in SAFE_METHODS or self.cookie in request.COOKIES
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with use_primary(self.pinned(request)):
+            response = self.get_response(request)
+        return self.pin_client(request, response)
+
+    async def __acall__(self, request):
+        with use_primary(self.pinned(request)):
+            response = await self.get_response(request)
+        return self.pin_client(request, response)
+
+    def pin_client(self, request, response):
+        if request.method not in SAFE_METHODS and self.pin_seconds > 0:
+            response.set_cookie(self.cookie, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,60 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+
+SEARCH_CONFIG = 'simple'
+
+
+
+
+def build_search_document(instance, fields):
+    """
+    Flatten the searchable fields of a row into one lowercase document.
+
+    Punctuation-separated parts (email local part and domain, UUID groups) are
+    appended as separate words so that they can be matched on their own.
+    """
+    text = ' '.join(str(value) for value in (getattr(instance, field) for field in fields) if value not in (None, '')).lower()
+    words = re.sub(r'[\W_]+', ' ', text).strip()
+    return f'{text} {words}' if words and words != text else text
+
+
+def search_terms(search):
+    return search.lower().split()
+
+
+def to_prefix_tsquery(terms):
+    quoted = ("'" + term.replace('\\', '\\\\').replace("'", "''") + "':*" for term in terms)
+    return ' & '.join(quoted)
+
+
+def apply_search(queryset, search, *alternatives):
+    """
+    Filter ``queryset`` down to the rows whose search document matches every term.
+
+    On PostgreSQL this runs against the GIN indexed ``search_vector`` column and
+    annotates ``search_rank`` with ``ts_rank``. Other backends fall back to LIKE
+    on ``search_document`` and get a constant rank. ``alternatives`` are extra Q
+    objects that are OR-ed with the document match.
+    """
+    terms = search_terms(search)
+    if not terms:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        column = f'{connection.ops.quote_name(queryset.model._meta.db_table)}.search_vector'
+        params = (SEARCH_CONFIG, to_prefix_tsquery(terms))
+        match = Q(RawSQL(f'{column} @@ to_tsquery(%s::regconfig, %s)', params, output_field=BooleanField()))
+        rank = RawSQL(f'ts_rank({column}, to_tsquery(%s::regconfig, %s))', params, output_field=FloatField())
+    else:
+        match = Q(*[Q(search_document__contains=term) for term in terms])
+        rank = Value(0.0, output_field=FloatField())
+
+    for alternative in alternatives:
+        match |= alternative
+
+    return queryset.filter(match).annotate(search_rank=rank)
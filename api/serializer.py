@@ -1,23 +1,47 @@
 from rest_framework import serializers
-from .models import Company, Employee
+from rest_framework.validators import UniqueValidator
+from django.db import transaction
+from django.db.models import Manager
+from .instrumentation import timed
+from .models import BulkJob, Company, Employee
 from collections import OrderedDict
+from functools import lru_cache
+from operator import attrgetter
 import uuid
 
 
 
+def company_summary(company):
+    return {'id': str(company.id), 'name': company.name}
+
+
+
+
+class EmployeeListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        # The bulk company endpoint prepares the child once for the employees of every company.
+        if isinstance(data, list) and self.instance is None and getattr(self.child, '_bulk_taken_emails', None) is None:
+            self.child.prepare_bulk_validation(data)
+        return super().to_internal_value(data)
+
+
+
+
 class EmployeeSerializer(serializers.ModelSerializer):
     company = serializers.SerializerMethodField()
 
     class Meta:
         model = Employee
-        fields = '__all__'
+        exclude = ['search_document', 'version', 'updated_at']
+        list_serializer_class = EmployeeListSerializer
 
     def __init__(self, *args, **kwargs): 
+        fields = kwargs.pop('fields', None)
         super().__init__(*args, **kwargs)
         request = self.context.get('request')
 
-        if request and '/api/employee/bulk/' in request.path:
-            self.fields['company'] = serializers.UUIDField(required=True, validators=[self.validate_company])
+        if self.is_bulk():
+            self.fields['company'] = serializers.UUIDField(required=True)
 
         elif request and request.path.startswith('/api/employee/'):
             self.fields['company'] = serializers.UUIDField(required=True)
@@ -26,9 +50,16 @@ class EmployeeSerializer(serializers.ModelSerializer):
             self.fields['company'] = serializers.SerializerMethodField()
         
         if 'company' in self.fields:
-            fields = OrderedDict(self.fields)
-            fields.move_to_end('company')
-            self.fields = fields
+            ordered_fields = OrderedDict(self.fields)
+            ordered_fields.move_to_end('company')
+            self.fields = ordered_fields
+
+        if fields is not None:
+            self.fields = OrderedDict((field, self.fields[field]) for field in fields if field in self.fields)
+
+    def is_bulk(self):
+        request = self.context.get('request')
+        return self.context.get('bulk', False) or bool(request and '/api/employee/bulk/' in request.path)
 
     def create(self, validated_data):
         company_id = validated_data.pop('company')
@@ -56,53 +87,214 @@ class EmployeeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Individuals under the age of 16 are not permitted to engage in employment.")
         return value
     
+    def validate_email(self, value):
+        taken_emails = getattr(self, '_bulk_taken_emails', None)
+        if taken_emails is not None:
+            employee_id = self.instance.pk if self.instance is not None else object()
+            if taken_emails.get(value, employee_id) != employee_id:
+                raise serializers.ValidationError("employee with this email already exists.")
+            if self._bulk_seen_emails.get(value, employee_id) != employee_id:
+                raise serializers.ValidationError("This email address appears more than once in the submitted data.")
+            self._bulk_seen_emails[value] = employee_id
+        return value
+
     def validate_company(self, value):
-        request = self.context.get('request')
-        if request and request.method == 'POST' and '/api/employee/bulk/' in request.path:
+        if self.is_bulk():
             if isinstance(value, uuid.UUID):
-                try:
-                    company = Company.objects.get(id=value)
-                    return company
-                except Company.DoesNotExist:
+                companies = getattr(self, '_bulk_companies', None)
+                company = companies.get(value) if companies is not None else Company.objects.filter(id=value).first()
+                if company is None:
                     raise serializers.ValidationError(f"Company with UUID {value} does not exist.")
+                return company
             else:
                 raise serializers.ValidationError("Invalid company UUID.")
         else:
             return value
 
+    def prepare_bulk_validation(self, rows):
+        """
+        Resolve every referenced company and every already taken email of a
+        bulk payload up front, so the per-row validation does not query.
+        """
+        rows = [row for row in rows if isinstance(row, dict)]
+
+        emails = {str(row['email']).strip() for row in rows if row.get('email')}
+        self.fields['email'].validators = [
+            validator for validator in self.fields['email'].validators if not isinstance(validator, UniqueValidator)
+        ]
+        self._bulk_taken_emails = dict(Employee.objects.filter(email__in=emails).values_list('email', 'id'))
+        self._bulk_seen_emails = {}
+
+        if isinstance(self.fields.get('company'), serializers.UUIDField):
+            company_ids = set()
+            for row in rows:
+                try:
+                    company_ids.add(uuid.UUID(str(row.get('company'))))
+                except ValueError:
+                    continue
+            self._bulk_companies = Company.objects.defer('search_document').in_bulk(company_ids)
+
         
     def get_company(self, obj):
-        if obj.company:
-            return CompanySerializer(obj.company, fields=['id', 'name']).data
-        return None
+        if obj.company_id is None:
+            return None
+        return company_summary(obj.company)
+
+    read_values = {'company': ['company_id', 'company__name']}
+
+    def get_company_from_values(self, row):
+        if row['company_id'] is None:
+            return None
+        return {'id': str(row['company_id']), 'name': row['company__name']}
 
 
 
 
 class CompanySerializer(serializers.ModelSerializer):
-    employee_count = serializers.SerializerMethodField()
+    employee_count = serializers.IntegerField(read_only = True)
     employees = EmployeeSerializer(many = True, required = False)
 
     class Meta:
         model = Company
-        fields = '__all__'
+        exclude = ['search_document', 'version', 'updated_at']
 
     def __init__(self, *args, **kwargs):
         fields = kwargs.pop('fields', None)
         super().__init__(*args, **kwargs)
-        if fields:
+        if fields is not None:
             allowed = list(fields)
             self.fields = OrderedDict((field, self.fields[field]) for field in allowed if field in self.fields)
 
-    def get_employee_count(self, obj):
-        return obj.employees.count()
-
     def create(self, validated_data):
         employees_data = validated_data.pop('employees', [])
-        company = super().create(validated_data)
-        
-        for employee_data in employees_data:
-            employee_data['company'] = company
-            Employee.objects.create(**employee_data)
 
-        return company
\ No newline at end of file
+        with transaction.atomic():
+            company = super().create(validated_data)
+
+            if employees_data:
+                employees = [Employee(company=company, **employee_data) for employee_data in employees_data]
+                for employee in employees:
+                    employee.update_search_document()
+
+                Employee.objects.bulk_create(employees)
+                Company.objects.adjust_employee_counts({company.id: len(employees_data)})
+                company.employee_count += len(employees_data)
+
+        return company
+
+
+
+
+class BulkJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BulkJob
+        exclude = ['payload', 'worker', 'heartbeat_at']
+
+
+
+
+# ----------------------------- compiled read path -----------------------------
+
+STR_FIELDS = (serializers.CharField, serializers.EmailField, serializers.RegexField, serializers.SlugField, serializers.URLField)
+
+
+def field_converter(field):
+    """A plain function producing exactly what ``field.to_representation`` does."""
+    field_type = type(field)
+    if field_type in STR_FIELDS:
+        return str
+    if field_type is serializers.IntegerField:
+        return int
+    if field_type is serializers.UUIDField and field.uuid_format == 'hex_verbose':
+        return str
+    if field_type is serializers.ChoiceField:
+        choices = field.choice_strings_to_values
+        return lambda value: choices.get(str(value), value)
+    if field_type is serializers.ReadOnlyField:
+        return None
+    return field.to_representation
+
+
+class ReadPlan:
+    """
+    Read-only representation of a serializer class, compiled once.
+
+    The field map a serializer builds in ``__init__`` is resolved here a
+    single time, and every field is reduced to a getter and a converter.
+    Rendering a row is then one loop with no per-field dispatch. Rows may be
+    model instances or ``.values(*plan.values_fields)`` dicts. The output is
+    identical to ``serializer_class(data, fields=fields).data`` for
+    serializers without context, which is how the list and detail GETs use
+    them.
+    """
+
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class(fields=fields) if fields is not None else serializer_class()
+        read_values = getattr(serializer_class, 'read_values', {})
+        self.steps = []
+        self.values_fields = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+
+            if isinstance(field, serializers.SerializerMethodField):
+                method = getattr(serializer, field.method_name)
+                values_method = getattr(serializer, f'{field.method_name}_from_values', None)
+                self.steps.append((name, None, method, values_method, None))
+                self.values_fields.extend(read_values.get(name, []))
+            elif isinstance(field, serializers.ListSerializer):
+                nested = read_plan(type(field.child))
+                self.steps.append((name, attrgetter('.'.join(field.source_attrs)), None, None, nested))
+            else:
+                key = '__'.join(field.source_attrs)
+                self.steps.append((name, attrgetter('.'.join(field.source_attrs)), field_converter(field), key, None))
+                self.values_fields.append(key)
+
+    def represent(self, obj):
+        ret = {}
+        if isinstance(obj, dict):
+            for name, getter, convert, key, nested in self.steps:
+                if getter is None:
+                    ret[name] = key(obj)
+                    continue
+                value = obj[key]
+                ret[name] = None if value is None else convert(value) if convert else value
+            return ret
+
+        for name, getter, convert, key, nested in self.steps:
+            if getter is None:
+                ret[name] = convert(obj)
+                continue
+            value = getter(obj)
+            if nested is not None:
+                ret[name] = nested.represent_many(value.all() if isinstance(value, Manager) else value)
+            else:
+                ret[name] = None if value is None else convert(value) if convert else value
+        return ret
+
+    def represent_many(self, rows):
+        represent = self.represent
+        return [represent(row) for row in rows]
+
+
+READ_PLAN_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=READ_PLAN_CACHE_SIZE)
+def read_plan(serializer_class, fields=None):
+    return ReadPlan(serializer_class, list(fields) if fields is not None else None)
+
+
+@timed('serialize')
+def read_data(serializer_class, data, many=False, fields=None):
+    """
+    Fast equivalent of ``serializer_class(data, many=many, fields=fields).data`` for GETs.
+
+    The plans are cached per field list. The views pass ``?fields=`` through
+    requested_fields(), which puts the fields in a canonical order, so the
+    order a client lists them in does not add entries; the cache is bounded
+    all the same.
+    """
+    plan = read_plan(serializer_class, tuple(dict.fromkeys(fields)) if fields is not None else None)
+    return plan.represent_many(data) if many else plan.represent(data)
@@ -0,0 +1,177 @@
+from contextlib import contextmanager, nullcontext
+from hashlib import md5
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from rest_framework import status
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no advisory file locks on this platform
+    fcntl = None
+
+
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.waiters = 0
+
+
+class AsyncFlight:
+    def __init__(self):
+        self.future = asyncio.get_running_loop().create_future()
+        self.waiters = 0
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+_async_flights = {}
+
+
+# How a single_flight() caller got its result.
+COMPUTED = 'computed'
+COALESCED = 'coalesced'
+CACHED = 'cached'
+
+LOCK_POLL_INTERVAL = 0.01
+
+
+def lock_path(key):
+    """One lock file per key, removed by its holder when the flight is over."""
+    directory = getattr(settings, 'SINGLE_FLIGHT_LOCK_DIR', None) or os.path.join(
+        tempfile.gettempdir(), 'restful-django-flights'
+    )
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{md5(key.encode(), usedforsecurity=False).hexdigest()}.lock')
+
+
+@contextmanager
+def host_lock(key, wait):
+    """
+    Take the key's lock file, polling for at most ``wait`` seconds. Yields
+    whether another process held it first, or None when it was still held
+    when the wait ran out; the caller then goes ahead without the lock.
+    """
+    path = lock_path(key)
+    deadline = time.monotonic() + wait
+    waited = False
+    while True:
+        lock_file = open(path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            waited = True
+            if time.monotonic() >= deadline:
+                yield None
+                return
+            time.sleep(LOCK_POLL_INTERVAL)
+            continue
+
+        # The previous holder removes the file before unlocking it, so a lock
+        # taken on a file that is no longer at ``path`` guards nothing.
+        try:
+            current = os.stat(path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current == os.fstat(lock_file.fileno()).st_ino:
+            break
+        lock_file.close()
+
+    try:
+        yield waited
+    finally:
+        os.unlink(path)
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+def single_flight(cache, key, compute, timeout):
+    """
+    Run ``compute`` once for all concurrent callers with the same key.
+
+    ``compute`` returns a ``(status_code, data)`` pair. Threads of this process
+    wait for the in-flight call and share its result. Other worker processes
+    on the host wait for the key's lock file, for at most SINGLE_FLIGHT_WAIT
+    seconds, and after taking it they find the leader's result in ``cache``
+    under ``key``. Successful results are stored there for ``timeout``
+    seconds. Returns ``(status_code, data, outcome)``, where ``outcome`` is
+    COMPUTED, COALESCED (shared with a call that was in flight) or CACHED
+    (stored by an earlier call that had already finished).
+    """
+    wait = getattr(settings, 'SINGLE_FLIGHT_WAIT', 30)
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Flight()
+        else:
+            flight.waiters += 1
+
+    if not leader:
+        if flight.done.wait(wait) and flight.result is not None:
+            return (*flight.result, COALESCED)
+        status_code, data = compute()
+        return status_code, data, COMPUTED
+
+    try:
+        with host_lock(key, wait) if fcntl else nullcontext(False) as waited:
+            data = cache.get(key)
+            if data is not None:
+                flight.result = (status.HTTP_200_OK, data)
+                return status.HTTP_200_OK, data, COALESCED if waited else CACHED
+
+            flight.result = compute()
+            status_code, data = flight.result
+            if status_code == status.HTTP_200_OK:
+                cache.set(key, data, timeout)
+            return status_code, data, COMPUTED
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+async def asingle_flight(cache, key, compute, timeout):
+    """
+    single_flight() for async views, where ``compute`` is a coroutine function.
+
+    Coroutines on the same event loop await the in-flight computation. The
+    host lock file is not taken, since flock() would block the loop, but the
+    leader still re-checks ``cache`` before computing and fills it afterwards.
+    """
+    flight = _async_flights.get(key)
+    if flight is not None:
+        flight.waiters += 1
+        try:
+            result = await asyncio.wait_for(asyncio.shield(flight.future), getattr(settings, 'SINGLE_FLIGHT_WAIT', 30))
+        except asyncio.TimeoutError:
+            result = None
+        if result is not None:
+            return (*result, COALESCED)
+        status_code, data = await compute()
+        return status_code, data, COMPUTED
+
+    flight = _async_flights[key] = AsyncFlight()
+    try:
+        data = await cache.aget(key)
+        if data is not None:
+            flight.future.set_result((status.HTTP_200_OK, data))
+            return status.HTTP_200_OK, data, CACHED
+
+        status_code, data = await compute()
+        if status_code == status.HTTP_200_OK:
+            await cache.aset(key, data, timeout)
+        flight.future.set_result((status_code, data))
+        return status_code, data, COMPUTED
+    finally:
+        del _async_flights[key]
+        if not flight.future.done():
+            flight.future.set_result(None)
@@ -0,0 +1,91 @@
+from django.db import connections
+from django.db.models import Aggregate, Avg, Count, F, FloatField, IntegerField, Max, Min
+from django.db.models.functions import Cast
+
+
+STATS_PERCENTILES = [25, 50, 75, 90, 99]
+DEFAULT_AGE_BUCKET = 10
+
+
+
+
+class Percentile(Aggregate):
+    """PostgreSQL ``percentile_cont``, the continuous percentile of the group."""
+    function = 'PERCENTILE_CONT'
+    name = 'Percentile'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, expression, percentile, **extra):
+        super().__init__(expression, fraction=percentile / 100, **extra)
+
+
+
+
+def rounded(value):
+    return None if value is None else round(value, 2)
+
+
+def age_summary(queryset):
+    """Count and age aggregates in one query. Percentiles are computed where the backend has them."""
+    aggregates = {'total': Count('pk'), 'min': Min('age'), 'max': Max('age'), 'avg': Avg('age')}
+
+    supports_percentiles = connections[queryset.db].vendor == 'postgresql'
+    if supports_percentiles:
+        aggregates.update({f'p{percentile}': Percentile('age', percentile) for percentile in STATS_PERCENTILES})
+
+    summary = queryset.aggregate(**aggregates)
+    return summary.pop('total'), {
+        'min': summary['min'],
+        'max': summary['max'],
+        'avg': rounded(summary['avg']),
+        'percentiles': {
+            f'p{percentile}': rounded(summary[f'p{percentile}']) for percentile in STATS_PERCENTILES
+        } if supports_percentiles else None,
+    }
+
+
+def job_title_breakdown(queryset):
+    rows = queryset.values('job_title').annotate(count=Count('pk'), avg_age=Avg('age')).order_by('job_title')
+    return [{**row, 'avg_age': rounded(row['avg_age'])} for row in rows]
+
+
+def age_distribution(queryset, bucket):
+    """Headcount per ``bucket`` years wide age range, e.g. 20-29, 30-39."""
+    bucket_start = Cast(F('age') / bucket, IntegerField()) * bucket
+    rows = queryset.annotate(age_from=bucket_start).values('age_from').annotate(count=Count('pk')).order_by('age_from')
+    return [{'age_from': row['age_from'], 'age_to': row['age_from'] + bucket - 1, 'count': row['count']} for row in rows]
+
+
+def company_breakdown(queryset):
+    rows = (
+        queryset.values('company_id', 'company__name')
+        .annotate(count=Count('pk'), avg_age=Avg('age'), min_age=Min('age'), max_age=Max('age'))
+        .order_by('-count', 'company__name')
+    )
+    return [
+        {
+            'company': {'id': row['company_id'], 'name': row['company__name']},
+            'count': row['count'],
+            'avg_age': rounded(row['avg_age']),
+            'min_age': row['min_age'],
+            'max_age': row['max_age'],
+        }
+        for row in rows
+    ]
+
+
+def employee_statistics(queryset, age_bucket=DEFAULT_AGE_BUCKET):
+    """
+    Headcount and age statistics of ``queryset``, all computed with GROUP BY
+    aggregates in the database: four queries, whatever the number of rows.
+    """
+    queryset = queryset.order_by()
+    total, age = age_summary(queryset)
+    return {
+        'total': total,
+        'age': age,
+        'by_job_title': job_title_breakdown(queryset),
+        'age_distribution': age_distribution(queryset, age_bucket),
+        'by_company': company_breakdown(queryset),
+    }
@@ -1,7 +1,49 @@
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework import status
 from django.urls import reverse
-from .models import Company, Employee
+from django.core.management import call_command
+from django.db import connection
+from django.conf import settings
+from django.core.cache.backends.db import DatabaseCache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from .models import BulkJob, Company, Employee
+from .serializer import CompanySerializer, EmployeeSerializer, read_data, read_plan
+from rest_framework.renderers import JSONRenderer
+from .jobs import run_job, run_pending_jobs
+from .cache import (
+    bump_generations, check_response_cache, generation_key, recently_written, response_cache, write_times
+)
+from .conditional import LIST_LABELS
+from .cache_backends import LRUFileBasedCache
+from .filters import (
+    COMPANY_ORDERING_FIELDS, EMPLOYEE_ORDERING_FIELDS, filter_companies, filter_employees, order_queryset,
+    search_companies, search_employees
+)
+from .pagination import KeysetPagination
+from .routers import PrimaryPinMiddleware, ReplicaRouter, use_primary
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from . import metrics, singleflight
+from .singleflight import CACHED, COALESCED, COMPUTED, single_flight
+from datetime import timedelta
+from base64 import b64encode
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import csv
+import json
+import msgpack
 import uuid
 
 
@@ -86,6 +128,256 @@ class CompanyAPITestCase(APITestCase):
         self.assertFalse(Company.objects.filter(id=self.company.id).exists())
         print(f"\nCompany DELETE ✔ ({response.status_code})")
 
+    def test_company_GET_employee_count_queries(self):
+        for i in range(3):
+            company = Company.objects.create(name=f"Count Cég {i}", address="1234 Teszt utca 1", phone="06301234567")
+            Employee.objects.create(name=f"Dolgozó {i}", email=f"count{i}@example.com", job_title="tester", age=30, company=company)
+
+        url = reverse('companies')
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'page_size': 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        counts = {company['name']: company['employee_count'] for company in response.data['results']}
+        self.assertEqual(counts["Count Cég 0"], 1)
+        self.assertEqual(counts[self.company.name], 0)
+
+        # The page count of the first request is reused from the count cache.
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'page_size': 10, 'with_employees': '1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse('company_detail', args=[self.company.id]))
+        self.assertEqual(response.data['employee_count'], 0)
+        print(f"\nCompany GET employee_count ✔ ({response.status_code})")
+
+    def test_company_GET_estimated_count(self):
+        url = reverse('companies')
+        response = self.client.get(url)
+        self.assertEqual((response.data['count'], response.data['count_estimated']), (1, False))
+
+        with patch('api.pagination.planner_estimate', return_value=250000):
+            Company.objects.create(name="Becsült Cég", address="1234 Teszt utca 1", phone="06301234567")
+            response = self.client.get(url, {'page_size': 10})
+            self.assertEqual((response.data['count'], response.data['count_estimated']), (250000, True))
+            self.assertEqual(len(response.data['results']), 2)
+
+            response = self.client.get(url, {'page_size': 10, 'count': 'exact'})
+            self.assertEqual((response.data['count'], response.data['count_estimated']), (2, False))
+
+            response = self.client.get(url, {'page_size': 5})
+            self.assertEqual((response.data['count'], response.data['count_estimated']), (2, False))
+
+        # The estimate is reported, but the pages that exist follow the rows.
+        Company.objects.create(name="Becsült Cég 2", address="1234 Teszt utca 1", phone="06301234567")
+        with patch('api.pagination.planner_estimate', return_value=250000):
+            response = self.client.get(url, {'page_size': 2, 'page': 2})
+            self.assertEqual(response.data['count'], 250000)
+            self.assertEqual(len(response.data['results']), 1)
+            self.assertIsNone(response.data['next'])
+            self.assertIsNotNone(response.data['previous'])
+            self.assertEqual(self.client.get(url, {'page_size': 2, 'page': 3}).status_code, status.HTTP_404_NOT_FOUND)
+
+        with patch('api.pagination.planner_estimate', return_value=1), patch('api.pagination.EXACT_COUNT_THRESHOLD', 0):
+            response = self.client.get(url, {'page_size': 1, 'page': 2})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual((response.data['count'], response.data['count_estimated']), (1, True))
+            self.assertIsNotNone(response.data['next'])
+            self.assertEqual(len(self.client.get(url, {'page_size': 1, 'page': 3}).data['results']), 1)
+        print(f"\nCompany GET estimated count ✔ ({response.status_code})")
+
+    def test_company_GET_cursor_pagination_nullable_ordering(self):
+        for i in range(5):
+            Company.objects.create(
+                name=f"Cursor Cég {i}", address="1234 Teszt utca 1", phone="06301234567",
+                description=None if i % 2 else f"Leírás {i % 3}"
+            )
+
+        url = reverse('companies')
+        for ordering in ['description', '-description']:
+            seen = []
+            response = self.client.get(url, {'pagination': 'cursor', 'ordering': ordering, 'page_size': 2})
+            while True:
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                seen += [company['id'] for company in response.data['results']]
+                if not response.data['next']:
+                    break
+                response = self.client.get(response.data['next'])
+            self.assertEqual(sorted(seen), sorted(str(pk) for pk in Company.objects.values_list('id', flat=True)))
+        print(f"\nCompany GET cursor pagination ✔ ({response.status_code})")
+
+    def test_company_GET_conditional(self):
+        url = reverse('company_detail', args=[self.company.id])
+        response = self.client.get(url, {'with_employees': '1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'with_employees': '1'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        Employee.objects.create(name="Új dolgozó", email="conditional@example.com", job_title="tester", age=30, company=self.company)
+        response = self.client.get(url, {'with_employees': '1'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['employee_count'], 1)
+
+        list_url = reverse('companies')
+        response = self.client.get(list_url)
+        list_etag = response['ETag']
+        self.assertTrue(list_etag.startswith('W/'))
+        self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=list_etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(url, data={"name": "Átnevezett Cég"}, format='json')
+        self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=list_etag).status_code, status.HTTP_200_OK)
+        print(f"\nCompany conditional GET ✔ ({response.status_code})")
+
+    def test_company_concurrent_saves_get_new_versions(self):
+        # Both copies were loaded at the same version, as by two concurrent requests.
+        first, second = Company.objects.get(pk=self.company.pk), Company.objects.get(pk=self.company.pk)
+        first.name = "Első mentés"
+        first.save()
+        second.description = "Második mentés"
+        second.save()
+        self.assertEqual((first.version, second.version), (2, 3))
+        self.assertEqual(Company.objects.get(pk=self.company.pk).version, 3)
+
+        second.save(update_fields=['name'])
+        self.assertEqual(second.version, 4)
+        print("\nCompany concurrent versions ✔")
+
+    def test_company_POST_nested_employees_count(self):
+        url = reverse('companies')
+        payload = dict(self.valid_payload, employees=[
+            {"name": "Nested 1", "email": "nested1@example.com", "job_title": "tester", "age": 30},
+            {"name": "Nested 2", "email": "nested2@example.com", "job_title": "developer", "age": 31},
+        ])
+        response = self.client.post(url, data=payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['employee_count'], 2)
+        self.assertEqual(Company.objects.get(id=response.data['id']).employee_count, 2)
+        print(f"\nCompany nested POST employee_count ✔ ({response.status_code})")
+
+    def test_reconcile_employee_counts(self):
+        Employee.objects.create(name="Drift", email="drift@example.com", job_title="tester", age=30, company=self.company)
+        Company.objects.filter(id=self.company.id).update(employee_count=7)
+
+        out = StringIO()
+        call_command('reconcile_employee_counts', '--dry-run', stdout=out)
+        self.assertIn("stored 7, actual 1", out.getvalue())
+        self.assertEqual(Company.objects.get(id=self.company.id).employee_count, 7)
+
+        call_command('reconcile_employee_counts', stdout=StringIO())
+        self.assertEqual(Company.objects.get(id=self.company.id).employee_count, 1)
+        print("\nReconcile employee counts ✔")
+
+    def test_bulk_company_post_create(self):
+        url = reverse('bulk_company')
+
+        def payload(prefix, size):
+            return {"action": "CREATE", "companies": [
+                dict(self.valid_payload, name=f"{prefix} Cég {i}", employees=[
+                    {"name": f"{prefix} {i}-{j}", "email": f"{prefix}{i}-{j}@example.com", "job_title": "tester", "age": 30}
+                    for j in range(i % 3)
+                ])
+                for i in range(size)
+            ]}
+
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.post(url, data=payload("small", 3), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['message'], "3 companies added with 3 employees.")
+        small_queries = len(small.captured_queries)
+
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(url, data=payload("large", 30), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(large.captured_queries), small_queries)
+
+        company = Company.objects.get(name="large Cég 29")
+        self.assertEqual(company.employee_count, 2)
+        self.assertEqual(company.employees.count(), 2)
+        self.assertEqual(Company.objects.count(), 34)
+        self.assertEqual(Employee.objects.count(), 33)
+        print(f"\nBulk Company POST [CREATE] ✔ ({response.status_code})")
+
+    def test_bulk_company_post_create_invalid(self):
+        url = reverse('bulk_company')
+        employee = {"name": "Dupla", "email": "dupla@example.com", "job_title": "tester", "age": 30}
+        data = {"action": "CREATE", "companies": [
+            dict(self.valid_payload, employees=[employee]),
+            dict(self.valid_payload, name="Másik Cég", employees=[employee]),
+            self.invalid_payload,
+        ]}
+        response = self.client.post(url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        errors = response.data['error']
+        self.assertEqual(errors[0], {})
+        self.assertIn('email', errors[1]['employees'][0])
+        self.assertIn('name', errors[2])
+        self.assertEqual(Company.objects.count(), 1)
+        self.assertEqual(Employee.objects.count(), 0)
+        print(f"\nBulk Company POST [CREATE] invalid ✔ ({response.status_code})")
+
+    def test_bulk_company_patch(self):
+        url = reverse('bulk_company')
+        other = Company.objects.create(name="Másik Cég", address="1234 Teszt utca 2", phone="06301234567")
+        version = self.company.version
+
+        response = self.client.patch(url, data=[
+            {"id": str(self.company.id), "name": "Átnevezett Cég"},
+            {"id": str(other.id), "description": "Új leírás"},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['message'], "2 companies updated.")
+
+        self.company.refresh_from_db()
+        self.assertEqual(self.company.name, "Átnevezett Cég")
+        self.assertGreater(self.company.version, version)
+        self.assertEqual(Company.objects.get(id=other.id).description, "Új leírás")
+
+        response = self.client.patch(url, data=[{"id": str(uuid.uuid4()), "name": "Nincs"}, {"name": "ID nélkül"}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data['errors']), 2)
+        print(f"\nBulk Company PATCH ✔ ({response.status_code})")
+
+    def test_bulk_company_post_delete(self):
+        url = reverse('bulk_company')
+        Employee.objects.create(name="Marad", email="marad@example.com", job_title="tester", age=30, company=self.company)
+
+        def create_companies(size):
+            return [
+                Company.objects.create(name=f"Törlendő {i}", address="1234 Teszt utca 3", phone="06301234567")
+                for i in range(size)
+            ]
+
+        def payload(companies, *extra_ids):
+            return {"action": "DELETE", "companies": [{"id": str(company.id)} for company in companies] + [{"id": i} for i in extra_ids]}
+
+        data = payload(create_companies(2))
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.post(url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['message'], "2 companies deleted.")
+        small_queries = len(small.captured_queries)
+
+        missing_id = str(uuid.uuid4())
+        data = payload([self.company, *create_companies(20)], missing_id)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(large.captured_queries), small_queries)
+        self.assertEqual(response.data['message'], "20 companies deleted.")
+        self.assertEqual(response.data['blocked'][0]['id'], self.company.id)
+        self.assertEqual(response.data['blocked'][0]['employee_count'], 1)
+        self.assertEqual(response.data['not_found'], [missing_id])
+        self.assertEqual(list(Company.objects.values_list('id', flat=True)), [self.company.id])
+        print(f"\nBulk Company POST [DELETE] ✔ ({response.status_code})")
+
 
 
 
@@ -198,6 +490,334 @@ class EmployeeAPITestCase(APITestCase):
         self.assertFalse(Employee.objects.filter(id=self.employee.id).exists())
         print(f"\nEmployee DELETE ✔ ({response.status_code})")
 
+    def test_employee_GET_company_summary_queries(self):
+        other_company = Company.objects.create(name="Summary Cég", address="1234 Teszt utca 15", phone="06301234567")
+        for i in range(5):
+            Employee.objects.create(name=f"Summary {i}", email=f"summary{i}@example.com", job_title="tester", age=30, company=other_company)
+
+        url = reverse('employees')
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'page_size': 10})
+        self.assertEqual(len(response.data['results']), 8)
+        summaries = {employee['company']['name']: employee['company'] for employee in response.data['results']}
+        self.assertEqual(summaries["Summary Cég"], {'id': str(other_company.id), 'name': "Summary Cég"})
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('employee_detail', args=[self.employee.id]))
+        self.assertEqual(response.data['company'], {'id': str(self.company.id), 'name': self.company.name})
+        print(f"\nEmployee GET company summary ✔ ({response.status_code})")
+
+    def test_employee_GET_conditional(self):
+        url = reverse('employee_detail', args=[self.employee.id])
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(reverse('bulk_employee'), data=[{"id": str(self.employee.id), "age": 33}], format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        self.client.patch(reverse('company_detail', args=[self.company.id]), data={"name": "Új név"}, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['company']['name'], "Új név")
+        print(f"\nEmployee conditional GET ✔ ({response.status_code})")
+
+    def test_employee_GET_substring_filters(self):
+        url = reverse('employees')
+        response = self.client.get(url, {'name': 'teszt EMPLOYEE'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+
+        response = self.client.get(url, {'company_name': 'company', 'email': 'EXAMPLE.com'})
+        self.assertEqual(response.data['count'], 2)
+
+        response = self.client.get(url, {'name': '%'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        print(f"\nEmployee GET substring filters ✔ ({response.status_code})")
+
+    def test_employee_GET_search(self):
+        url = reverse('employees')
+        response = self.client.get(url, {'search': 'ALADÁR'})
+        self.assertEqual([employee['id'] for employee in response.data['results']], [str(self.employee.id)])
+        self.assertNotIn('search_document', response.data['results'][0])
+
+        response = self.client.get(url, {'search': 'example developer'})
+        self.assertEqual([employee['id'] for employee in response.data['results']], [str(self.employee2.id)])
+
+        response = self.client.get(url, {'search': 'teszt company'})
+        self.assertEqual(response.data['count'], 3)
+
+        self.client.patch(reverse('employee_detail', args=[self.employee.id]), data={"name": "Kereshető"}, format='json')
+        self.client.post(reverse('bulk_employee'), data={"action": "CREATE", "employees": [
+            {"name": "Bulk Kereshető", "email": "bulk-search@example.com", "job_title": "tester", "age": 30, "company": str(self.company.id)},
+        ]}, format='json')
+        response = self.client.get(url, {'search': 'kereshető'})
+        self.assertEqual(response.data['count'], 2)
+
+        response = self.client.get(url, {'search': 'aladár'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        print(f"\nEmployee GET search ✔ ({response.status_code})")
+
+    def test_employee_export(self):
+        url = reverse('employee_export')
+        response = self.client.get(url, {'job_title': 'developer'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows, [{
+            'id': str(self.employee2.id), 'name': "Teszt Employee 2", 'email': "employee2@example.com",
+            'job_title': "developer", 'age': 30, 'company': {'id': str(self.company.id), 'name': self.company.name}
+        }])
+
+        response = self.client.get(url, {'export_format': 'csv', 'ordering': '-age'})
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([row['age'] for row in rows], ['30', '28', '23'])
+        self.assertEqual(rows[0]['company_name'], self.company.name)
+
+        response = self.client.get(reverse('company_export'), {'with_employees': '1'})
+        companies = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(companies[0]['employee_count'], 3)
+        self.assertEqual(len(companies[0]['employees']), 3)
+
+        response = self.client.get(url, {'export_format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        print(f"\nEmployee export ✔ ({response.status_code})")
+
+    def test_employee_GET_cursor_pagination(self):
+        other_company = Company.objects.create(name="Cursor Cég", address="1234 Teszt utca 14", phone="06301234567")
+        for i in range(7):
+            Employee.objects.create(
+                name="Ugyanaz" if i % 2 else f"Cursor {i}", email=f"cursor{i}@example.com",
+                job_title="tester", age=20 + i, company=other_company if i % 3 else self.company
+            )
+
+        url = reverse('employees')
+        for ordering in ['-name', 'company', 'age']:
+            tiebreaker = '-id' if ordering.startswith('-') else 'id'
+            expected = [str(pk) for pk in Employee.objects.order_by(ordering, tiebreaker).values_list('id', flat=True)]
+            seen, pages = [], []
+            response = self.client.get(url, {'pagination': 'cursor', 'ordering': ordering, 'page_size': 3})
+            while True:
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn('count', response.data)
+                pages.append(response.data)
+                seen += [employee['id'] for employee in response.data['results']]
+                if not response.data['next']:
+                    break
+                response = self.client.get(response.data['next'])
+
+            self.assertEqual(seen, expected)
+            self.assertIsNone(pages[0]['previous'])
+
+            response = self.client.get(pages[-1]['previous'])
+            self.assertEqual(response.data['results'], pages[-2]['results'])
+
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        def cursor(position):
+            return b64encode(json.dumps(position).encode(), altchars=b'-_').decode('ascii')
+
+        for ordering, position in [
+            (None, {'v': None, 'id': 'not-a-uuid'}),
+            (None, {'v': None, 'id': None}),
+            ('age', {'v': {'nested': 1}, 'id': str(self.employee.id)}),
+            ('age', {'v': 'harminc', 'id': str(self.employee.id)}),
+            ('company', {'v': 'not-a-uuid', 'id': str(self.employee.id)}),
+            ('name', {'v': ['list'], 'id': str(self.employee.id)}),
+        ]:
+            params = {'cursor': cursor(position), **({'ordering': ordering} if ordering else {})}
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+        print(f"\nEmployee GET cursor pagination ✔ ({response.status_code})")
+
+    def test_employee_count_write_paths(self):
+        other_company = Company.objects.create(name="Másik Cég", address="1234 Teszt utca 13", phone="06301234567")
+        self.company.refresh_from_db()
+        self.assertEqual(self.company.employee_count, 3)
+
+        response = self.client.patch(
+            reverse('employee_detail', args=[self.employee.id]), data={"company": str(other_company.id)}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.company.refresh_from_db()
+        other_company.refresh_from_db()
+        self.assertEqual((self.company.employee_count, other_company.employee_count), (2, 1))
+
+        self.client.post(reverse('bulk_employee'), data={"action": "CREATE", "employees": [
+            {"name": "Bulk 1", "email": "bulk1@example.com", "job_title": "tester", "age": 30, "company": str(other_company.id)},
+            {"name": "Bulk 2", "email": "bulk2@example.com", "job_title": "tester", "age": 30, "company": str(self.company.id)},
+        ]}, format='json')
+        self.client.post(reverse('bulk_employee'), data={"action": "DELETE", "employees": [
+            {"id": str(self.employee2.id)}, {"id": str(self.employee.id)}
+        ]}, format='json')
+        self.client.delete(reverse('employee_detail', args=[self.employee3.id]))
+
+        self.company.refresh_from_db()
+        other_company.refresh_from_db()
+        self.assertEqual((self.company.employee_count, other_company.employee_count), (1, 1))
+        self.assertEqual(self.company.employee_count, self.company.employees.count())
+
+        # A second, concurrent delete of the same employee removes no row and no count.
+        self.employee3.delete()
+        self.company.refresh_from_db()
+        self.assertEqual(self.company.employee_count, 1)
+        print("\nEmployee count write paths ✔")
+
+    def test_async_views_match_sync_views(self):
+        cases = [
+            ('companies', [], {}),
+            ('companies', [], {'with_employees': '1', 'ordering': '-name'}),
+            ('companies', [], {'search': 'nincs ilyen cég'}),
+            ('companies', [], {'ordering': 'invalid'}),
+            ('company_detail', [self.company.id], {'with_employees': '1'}),
+            ('company_detail', [uuid.uuid4()], {}),
+            ('employees', [], {'ordering': '-age', 'page_size': 2}),
+            ('employees', [], {'pagination': 'cursor', 'ordering': 'name', 'page_size': 2}),
+            ('employees', [], {'age': 99}),
+            ('employee_detail', [self.employee.id], {}),
+            ('employees', [], {'fields': 'name,company'}),
+            ('company_detail', [self.company.id], {'fields': 'name,employees'}),
+            ('companies', [], {'fields': 'x'}),
+        ]
+        def clear_responses():
+            # Keep the generations, the list ETags are built from them.
+            generations = response_cache().get_many([generation_key(label) for label in LIST_LABELS])
+            response_cache().clear()
+            response_cache().set_many(generations, timeout=None)
+
+        for name, args, params in cases:
+            url = reverse(name, args=args)
+            clear_responses()
+            expected = self.client.get(url, params)
+            clear_responses()
+            with override_settings(ROOT_URLCONF='Excercize.asgi_urls'):
+                response = self.client.get(url, params)
+            self.assertEqual((response.status_code, response.json()), (expected.status_code, expected.json()))
+            self.assertEqual(response.get('ETag'), expected.get('ETag'))
+
+        url = reverse('employee_detail', args=[self.employee.id])
+        with override_settings(ROOT_URLCONF='Excercize.asgi_urls'):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+            response = self.client.patch(url, data={"age": 41}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).data['age'], 41)
+        print(f"\nAsync views ✔ ({response.status_code})")
+
+    def test_employee_stats(self):
+        url = reverse('employee_stats')
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {'age_bucket': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['age'], {'min': 23, 'max': 30, 'avg': 27.0, 'percentiles': None})
+        self.assertEqual(
+            [(row['job_title'], row['count']) for row in response.data['by_job_title']],
+            [('designer', 1), ('developer', 1), ('tester', 1)]
+        )
+        self.assertEqual(
+            response.data['age_distribution'],
+            [{'age_from': 20, 'age_to': 24, 'count': 1}, {'age_from': 25, 'age_to': 29, 'count': 1}, {'age_from': 30, 'age_to': 34, 'count': 1}]
+        )
+        self.assertEqual(response.data['by_company'], [{
+            'company': {'id': self.company.id, 'name': self.company.name},
+            'count': 3, 'avg_age': 27.0, 'min_age': 23, 'max_age': 30
+        }])
+        self.assertEqual(self.client.get(url, {'age_bucket': 5})['X-Cache'], 'HIT')
+
+        response = self.client.get(url, {'job_title': 'de'})
+        self.assertEqual(response.data['total'], 2)
+        self.assertEqual(response.data['age']['avg'], 29.0)
+
+        Employee.objects.filter(pk=self.employee.pk).update(age=40)
+        response = self.client.get(url, {'age_bucket': 5})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['age']['max'], 40)
+
+        response = self.client.get(url, {'age_bucket': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        print(f"\nEmployee stats ✔ ({response.status_code})")
+
+    def test_sparse_fieldsets(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('employees'), {'fields': 'id,name'})
+        self.assertEqual([list(employee) for employee in response.data['results']], [['id', 'name']] * 3)
+        page_query = queries.captured_queries[-1]['sql']
+        self.assertNotIn('JOIN', page_query)
+        self.assertNotIn('"email"', page_query)
+
+        response = self.client.get(reverse('employees'), {'fields': 'name,company', 'pagination': 'cursor', 'ordering': 'age', 'page_size': 1})
+        self.assertEqual(response.data['results'][0], {'name': self.employee.name, 'company': {'id': str(self.company.id), 'name': self.company.name}})
+        self.assertIsNotNone(response.data['next'])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('companies'), {'fields': 'id,name'})
+        self.assertEqual(response.data['results'], [{'id': str(self.company.id), 'name': self.company.name}])
+        self.assertNotIn('"employee_count"', queries.captured_queries[-1]['sql'])
+
+        response = self.client.get(reverse('companies'), {'fields': 'name,employees'})
+        self.assertEqual(list(response.data['results'][0]), ['name', 'employees'])
+        self.assertEqual(len(response.data['results'][0]['employees']), 3)
+
+        url = reverse('company_detail', args=[self.company.id])
+        response = self.client.get(url, {'fields': 'name,employee_count'})
+        self.assertEqual(response.data, {'name': self.company.name, 'employee_count': 3})
+        self.assertNotEqual(response['ETag'], self.client.get(url)['ETag'])
+        self.assertEqual(len(self.client.get(url, {'fields': 'id,employees'}).data['employees']), 3)
+
+        response = self.client.get(reverse('employee_detail', args=[self.employee.id]), {'fields': 'email'})
+        self.assertEqual(response.data, {'email': self.employee.email})
+
+        # The order of the listed fields changes neither the body, nor its ETag, nor its cache entry.
+        response = self.client.get(url, {'fields': 'employee_count,name'})
+        self.assertEqual(list(response.data), ['name', 'employee_count'])
+        self.assertEqual(response['ETag'], self.client.get(url, {'fields': 'name,employee_count'})['ETag'])
+        first = self.client.get(reverse('companies'), {'fields': 'phone,name'})
+        second = self.client.get(reverse('companies'), {'fields': 'name,phone'})
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(list(first.data['results'][0]), ['name', 'phone'])
+
+        response = self.client.get(reverse('employees'), {'fields': 'id,salary'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        read_plan.cache_clear()
+        for fields in ['id,name,email', 'email,name,id', 'name,id,email,name']:
+            self.client.get(reverse('employees'), {'fields': fields, 'nocache': fields})
+        self.assertEqual(read_plan.cache_info().currsize, 1)
+        self.assertEqual(read_plan.cache_info().maxsize, 256)
+        print(f"\nSparse fieldsets ✔ ({response.status_code})")
+
+    def test_read_data_matches_serializers(self):
+        renderer = JSONRenderer()
+        Company.objects.filter(id=self.company.id).update(description=None)
+        employees = list(Employee.objects.select_related('company').order_by('name'))
+        company = Company.objects.prefetch_related('employees').get(id=self.company.id)
+        fields = ['id', 'name', 'address', 'phone', 'description', 'employee_count']
+
+        cases = [
+            (EmployeeSerializer(employees[0]).data, read_data(EmployeeSerializer, employees[0])),
+            (EmployeeSerializer(employees, many=True).data, read_data(EmployeeSerializer, employees, many=True)),
+            (CompanySerializer(company, fields=fields).data, read_data(CompanySerializer, company, fields=fields)),
+            (
+                CompanySerializer([company], many=True, fields=fields + ['employees']).data,
+                read_data(CompanySerializer, [company], many=True, fields=fields + ['employees'])
+            ),
+        ]
+        plan = read_plan(EmployeeSerializer)
+        rows = Employee.objects.order_by('name').values(*plan.values_fields)
+        cases.append((EmployeeSerializer(employees, many=True).data, plan.represent_many(rows)))
+
+        for expected, data in cases:
+            self.assertEqual(renderer.render(data), renderer.render(expected))
+        print("\nCompiled read path ✔")
+
 
 
 
@@ -237,6 +857,88 @@ class EmployeeAPITestCase(APITestCase):
         self.assertEqual(Employee.objects.count(), 6)
         print(f"\nBulk Employee valid POST [CREATE] ✔ ({response.status_code})")
 
+    def test_bulk_employee_msgpack(self):
+        url = reverse('bulk_employee')
+        payload = {"action": "CREATE", "employees": [
+            {"name": f"Msgpack {i}", "email": f"msgpack{i}@example.com", "job_title": "tester", "age": 30, "company": str(self.company.id)}
+            for i in range(3)
+        ]}
+        response = self.client.post(
+            url, data=msgpack.packb(payload), content_type='application/msgpack', HTTP_ACCEPT='application/msgpack'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), response.data)
+        self.assertEqual(Employee.objects.filter(email__startswith='msgpack').count(), 3)
+
+        response = self.client.post(url, data=b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse('employee_detail', args=[self.employee.id]), HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['id'], str(self.employee.id))
+        print(f"\nBulk Employee MessagePack ✔ ({response.status_code})")
+
+    def test_employee_GET_orjson(self):
+        url = reverse('employees')
+        default = self.client.get(url)
+        self.assertEqual(default['Content-Type'], 'application/json')
+        self.assertEqual(default.content, JSONRenderer().render(default.data))
+
+        response = self.client.get(url, HTTP_ACCEPT='application/json; encoder=orjson')
+        self.assertEqual(response['Content-Type'], 'application/json; encoder=orjson')
+        self.assertEqual(json.loads(response.content), json.loads(default.content))
+
+        # Errors DRF cannot negotiate fall back to plain JSON.
+        response = self.client.get(url, HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        response = self.client.post(url, data='{"name": ', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        print(f"\nEmployee GET orjson ✔ ({response.status_code})")
+
+    def test_bulk_employee_post_create_query_count(self):
+        url = reverse('bulk_employee')
+        other_company = Company.objects.create(name="Bulk Cég", address="1234 Teszt utca 16", phone="06301234567")
+
+        def payload(prefix, size):
+            return {"action": "CREATE", "employees": [
+                {
+                    "name": f"{prefix} {i}", "email": f"{prefix}{i}@example.com", "job_title": "tester", "age": 30,
+                    "company": str(other_company.id if i % 2 else self.company.id)
+                }
+                for i in range(size)
+            ]}
+
+        with self.assertNumQueries(6):
+            response = self.client.post(url, data=payload("small", 3), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with self.assertNumQueries(6):
+            response = self.client.post(url, data=payload("large", 40), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Employee.objects.count(), 46)
+        print(f"\nBulk Employee POST [CREATE] query count ✔ ({response.status_code})")
+
+    def test_bulk_employee_post_create_row_errors(self):
+        url = reverse('bulk_employee')
+        data = {"action": "CREATE", "employees": [
+            {"name": "Új 1", "email": "uj@example.com", "job_title": "tester", "age": 30, "company": str(self.company.id)},
+            {"name": "Új 2", "email": "uj@example.com", "job_title": "tester", "age": 30, "company": str(self.company.id)},
+            {"name": "Új 3", "email": "employee2@example.com", "job_title": "tester", "age": 30, "company": str(self.company.id)},
+            {"name": "Új 4", "email": "uj4@example.com", "job_title": "tester", "age": 30, "company": str(uuid.uuid4())},
+        ]}
+        response = self.client.post(url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        errors = response.data['error']
+        self.assertEqual(errors[0], {})
+        self.assertIn('email', errors[1])
+        self.assertEqual(errors[2]['email'], ["employee with this email already exists."])
+        self.assertIn('company', errors[3])
+        self.assertEqual(Employee.objects.count(), 3)
+        print(f"\nBulk Employee POST [CREATE] row errors ✔ ({response.status_code})")
+
     def test_bulk_employee_post_create_invalid(self):
         url = reverse('bulk_employee')
         invalid_data = {
@@ -403,6 +1105,40 @@ class EmployeeAPITestCase(APITestCase):
 
 
 
+    def test_bulk_employee_patch_mixed_fields(self):
+        url = reverse('bulk_employee')
+        other_company = Company.objects.create(name="Patch Cég", address="1234 Teszt utca 17", phone="06301234567")
+        data = [
+            {"id": str(self.employee.id), "name": "Csak Név"},
+            {"id": str(self.employee2.id), "age": 55},
+            {"id": str(self.employee3.id), "company": str(other_company.id)},
+        ]
+
+        with self.assertNumQueries(7):
+            response = self.client.patch(url + '?batch_size=2', data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.employee.refresh_from_db()
+        self.employee2.refresh_from_db()
+        self.employee3.refresh_from_db()
+        self.assertEqual((self.employee.name, self.employee.age), ("Csak Név", 23))
+        self.assertEqual((self.employee2.name, self.employee2.age), ("Teszt Employee 2", 55))
+        self.assertEqual(self.employee3.company_id, other_company.id)
+        self.assertIn("csak név", self.employee.search_document)
+
+        self.company.refresh_from_db()
+        other_company.refresh_from_db()
+        self.assertEqual((self.company.employee_count, other_company.employee_count), (2, 1))
+
+        response = self.client.patch(url, data=[
+            {"id": str(self.employee.id), "email": "same@example.com"},
+            {"id": str(self.employee2.id), "email": "same@example.com"},
+            {"id": str(self.employee3.id), "email": "email@email.email"},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data['errors']), 2)
+        print(f"\nBulk Employee PATCH mixed fields ✔ ({response.status_code})")
+
     def test_bulk_employee_patch_invalid(self):
         url = reverse('bulk_employee')
         invalid_data = [
@@ -471,4 +1207,495 @@ class EmployeeAPITestCase(APITestCase):
         }
         response = self.client.post(url, data=invalid_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        print(f"\nBulk Employee invalid POST [DELETE] ✔ ({response.status_code})")
\ No newline at end of file
+        print(f"\nBulk Employee invalid POST [DELETE] ✔ ({response.status_code})")
+
+
+
+    def test_bulk_employee_async_jobs(self):
+        url = reverse('bulk_employee')
+        data = {"action": "CREATE", "employees": [
+            {"name": f"Async {i}", "email": f"async{i}@example.com", "job_title": "tester", "age": 30, "company": str(self.company.id)}
+            for i in range(5)
+        ] + [{"name": "Async hibás", "email": "async-hibas", "job_title": "tester", "age": 10, "company": str(self.company.id)}]}
+
+        response = self.client.post(url + '?async=1', data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Employee.objects.count(), 3)
+        status_url = response.data['status_url']
+
+        response = self.client.get(status_url)
+        self.assertEqual((response.data['status'], response.data['processed']), ('pending', 0))
+
+        self.assertEqual(run_pending_jobs('test-worker', chunk_size=2), 1)
+        response = self.client.get(status_url)
+        self.assertEqual(response.data['status'], 'succeeded')
+        self.assertEqual((response.data['total'], response.data['processed']), (6, 6))
+        self.assertEqual(response.data['result'], {'created': 5, 'failed': 1})
+        self.assertEqual(response.data['errors'][0]['row'], 5)
+        self.assertIn('age', response.data['errors'][0]['errors'])
+        self.assertEqual(Company.objects.get(id=self.company.id).employee_count, 8)
+
+        response = self.client.patch(url + '?async=1', data=[
+            {"id": str(self.employee.id), "age": 41}, {"id": str(uuid.uuid4()), "age": 42}
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        run_pending_jobs('test-worker')
+        job = BulkJob.objects.get(id=response.data['job_id'])
+        self.assertEqual((job.status, job.result), ('succeeded', {'updated': 1, 'failed': 1}))
+        self.employee.refresh_from_db()
+        self.assertEqual(self.employee.age, 41)
+
+        response = self.client.get(reverse('bulk_employee_job', args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        print(f"\nBulk Employee async jobs ✔ ({response.status_code})")
+
+    def test_bulk_employee_job_taken_over(self):
+        rows = [
+            {"name": f"Átvett {i}", "email": f"atvett{i}@example.com", "job_title": "tester", "age": 30, "company": str(self.company.id)}
+            for i in range(4)
+        ]
+        BulkJob.objects.enqueue('CREATE', rows)
+        job = BulkJob.objects.claim('slow-worker', timedelta(minutes=5))
+
+        # The slow worker's heartbeat went stale and another worker claimed the job and applied the first chunk.
+        BulkJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=10))
+        takeover = BulkJob.objects.claim('new-worker', timedelta(minutes=5))
+        self.assertEqual(takeover.pk, job.pk)
+        BulkJob.objects.filter(pk=job.pk).update(processed=2)
+
+        with self.assertLogs('api.jobs', 'WARNING'):
+            job = run_job(job, chunk_size=2)
+        self.assertEqual((job.worker, job.status, job.processed), ('new-worker', 'running', 2))
+        self.assertEqual(Employee.objects.filter(email__startswith='atvett').count(), 0)
+        self.assertEqual(Company.objects.get(id=self.company.id).employee_count, 3)
+        print("\nBulk Employee job taken over ✔")
+
+
+
+
+# -------------------------------------- RESPONSE CACHE --------------------------------------
+
+
+class ResponseCacheTestCase(APITestCase):
+    def setUp(self):
+        response_cache().clear()
+        self.company = Company.objects.create(name="Cache Cég", address="1234 Teszt utca 20", phone="06301234567")
+        self.employee, self.employee2, self.employee3 = [
+            Employee.objects.create(
+                name=f"Cache Dolgozó {i}", email=f"cache-employee{i}@example.com", job_title="tester", age=30, company=self.company
+            )
+            for i in range(3)
+        ]
+
+    def test_company_list_response_cache(self):
+        url = reverse('companies')
+        params = {'with_employees': '1', 'ordering': 'name'}
+        self.assertEqual(self.client.get(url, params)['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            response = self.client.get(f"{url}?ordering=name&with_employees=1")
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['results'][0]['employee_count'], 3)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.post(reverse('bulk_employee'), data={"action": "CREATE", "employees": [
+            {"name": "Cache 1", "email": "cache1@example.com", "job_title": "tester", "age": 30, "company": str(self.company.id)},
+        ]}, format='json')
+        response = self.client.get(url, params)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['employee_count'], 4)
+
+        self.client.patch(reverse('bulk_employee'), data=[{"id": str(self.employee.id), "name": "Átnevezett"}], format='json')
+        response = self.client.get(url, params)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn("Átnevezett", [employee['name'] for employee in response.data['results'][0]['employees']])
+
+        self.client.post(reverse('bulk_employee'), data={"action": "DELETE", "employees": [{"id": str(self.employee2.id)}]}, format='json')
+        response = self.client.get(url, params)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['employee_count'], 3)
+
+        Company.objects.filter(id=self.company.id).update(name="Frissített Cég")
+        response = self.client.get(url, params)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['name'], "Frissített Cég")
+        print(f"\nCompany list response cache ✔ ({response.status_code})")
+
+    def test_lru_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = LRUFileBasedCache(directory, {'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3}})
+            for index, key in enumerate(['a', 'b', 'c']):
+                cache.set(key, key)
+                os.utime(cache._key_to_file(key), ns=(index, index))
+
+            self.assertEqual(cache.get('a'), 'a')
+            cache.set('d', 'd')
+            self.assertEqual([cache.get(key) for key in ['a', 'b', 'c', 'd']], ['a', None, 'c', 'd'])
+        print("\nLRU file based cache ✔")
+
+    def test_locmem_response_cache_refused(self):
+        locmem = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        with override_settings(CACHES={**settings.CACHES, 'responses': locmem}):
+            with self.assertRaises(ImproperlyConfigured):
+                check_response_cache()
+            with override_settings(RESPONSE_CACHE_SINGLE_PROCESS=True):
+                check_response_cache()
+        check_response_cache()
+        with override_settings(CACHES={**settings.CACHES, 'replica_pins': locmem}, DATABASE_REPLICAS=['replica1']):
+            with self.assertRaises(ImproperlyConfigured):
+                check_response_cache()
+        print("\nLocmem response cache refused ✔")
+
+
+class SingleFlightTestCase(APITestCase):
+    def setUp(self):
+        response_cache().clear()
+        self.company = Company.objects.create(name="Flight Cég", address="1234 Teszt utca 22", phone="06301234567")
+        Employee.objects.create(name="Flight Dolgozó", email="flight@example.com", job_title="tester", age=30, company=self.company)
+
+    def test_single_flight_coalesces_concurrent_calls(self):
+        cache = response_cache()
+        key = f"flight:test:{uuid.uuid4()}"
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return status.HTTP_200_OK, {'value': len(calls)}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(single_flight(cache, key, compute, 2))) for _ in range(5)]
+        threads[0].start()
+        while key not in singleflight._flights:
+            time.sleep(0.001)
+        for thread in threads[1:]:
+            thread.start()
+        while singleflight._flights[key].waiters < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(outcome for _, _, outcome in results), [COALESCED] * 4 + [COMPUTED])
+        self.assertTrue(all(data == {'value': 1} for _, data, _ in results))
+
+        self.assertEqual(single_flight(cache, key, compute, 2), (status.HTTP_200_OK, {'value': 1}, CACHED))
+        self.assertEqual(len(calls), 1)
+
+        url = reverse('employees')
+        first, second = self.client.get(url), self.client.get(url)
+        self.assertEqual((first['X-Coalesced'], second['X-Coalesced']), ('0', '0'))
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+        print("\nSingle flight ✔")
+
+    @skipUnless(singleflight.fcntl, "needs advisory file locks")
+    def test_single_flight_host_lock(self):
+        cache = response_cache()
+        key, other_key = f"flight:test:{uuid.uuid4()}", f"flight:test:{uuid.uuid4()}"
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return status.HTTP_200_OK, {'value': len(calls)}
+
+        # Another process is computing the key: the leader here waits for its lock and shares its result.
+        results = []
+        with singleflight.host_lock(key, 0) as waited:
+            self.assertFalse(waited)
+            with singleflight.host_lock(other_key, 0) as other_waited:
+                self.assertFalse(other_waited)
+
+            thread = threading.Thread(target=lambda: results.append(single_flight(cache, key, compute, 2)))
+            thread.start()
+            time.sleep(0.05)
+            cache.set(key, {'value': 'other process'}, 2)
+        thread.join()
+        self.assertEqual(results, [(status.HTTP_200_OK, {'value': 'other process'}, COALESCED)])
+        self.assertEqual(calls, [])
+
+        # A holder that never finishes only delays the others by SINGLE_FLIGHT_WAIT.
+        with override_settings(SINGLE_FLIGHT_WAIT=0.05), singleflight.host_lock(other_key, 0):
+            self.assertEqual(single_flight(cache, other_key, compute, 2), (status.HTTP_200_OK, {'value': 1}, COMPUTED))
+        self.assertFalse(os.path.exists(singleflight.lock_path(other_key)))
+        print("\nSingle flight host lock ✔")
+
+
+
+
+# -------------------------------------- METRICS --------------------------------------
+
+
+class MetricsTestCase(APITestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="Metrika Cég", address="1234 Teszt utca 21", phone="06301234567")
+        self.employee = Employee.objects.create(
+            name="Metrika Dolgozó", email="metrics@example.com", job_title="tester", age=30, company=self.company
+        )
+
+    def test_sql_instrumentation(self):
+        url = reverse('employees')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'ordering': 'age'})
+        query_count = len(queries.captured_queries)
+        self.assertEqual(response['X-Query-Count'], str(query_count))
+        timings = [timing.split(';')[0] for timing in response['Server-Timing'].split(', ')]
+        self.assertEqual(timings, ['db', 'serialize', 'render', 'total'])
+
+        with self.settings(SLOW_REQUEST_MS=0), self.assertLogs('api.slow_requests', 'WARNING') as logs:
+            self.client.handler.load_middleware()
+            response = self.client.get(url, {'ordering': 'name'})
+        self.client.handler.load_middleware()
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual((entry['path'], entry['status']), (url, 200))
+        self.assertEqual(entry['query_count'], int(response['X-Query-Count']))
+        self.assertEqual(len(entry['queries']), entry['query_count'])
+        self.assertIn('"api_employee"', entry['queries'][-1]['sql'])
+
+        response_cache().clear()
+        with override_settings(ROOT_URLCONF='Excercize.asgi_urls'):
+            response = self.client.get(url, {'ordering': 'age'})
+        self.assertEqual(response['X-Query-Count'], str(query_count))
+
+        with self.settings(SQL_INSTRUMENTATION=False):
+            self.client.handler.load_middleware()
+            response = self.client.get(url)
+        self.assertNotIn('X-Query-Count', response)
+        self.assertNotIn('Server-Timing', response)
+
+        with self.settings(SQL_INSTRUMENTATION_HEADERS=False):
+            self.client.handler.load_middleware()
+            response = self.client.get(url)
+        self.assertNotIn('Server-Timing', response)
+        print(f"\nSQL instrumentation ✔ ({response.status_code})")
+
+    def test_metrics_across_processes(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            self.client.get(reverse('employees'))
+            self.client.get(reverse('employee_detail', args=[uuid.uuid4()]))
+            self.client.post(reverse('bulk_employee'), {'action': 'DELETE', 'employees': [{'id': str(self.employee.id)}]}, format='json')
+
+            worker = multiprocessing.get_context('fork').Process(
+                target=metrics.write, args=(metrics.REQUESTS.samples(view='employees', method='GET', status=200),)
+            )
+            worker.start()
+            worker.join()
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+            response = self.client.get(reverse('metrics'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            lines = response.content.decode().splitlines()
+            self.assertIn('http_requests_total{method="GET",status="200",view="employees"} 2.0', lines)
+            self.assertIn('http_requests_total{method="GET",status="404",view="employee_detail"} 1.0', lines)
+            self.assertIn('http_request_duration_seconds_count{view="employees"} 1.0', lines)
+            self.assertIn('http_request_duration_seconds_bucket{le="+Inf",view="employees"} 1.0', lines)
+            self.assertIn('bulk_batch_size_bucket{action="DELETE",le="1.0",view="bulk_employee"} 1.0', lines)
+            self.assertIn('bulk_batch_size_sum{action="DELETE",view="bulk_employee"} 1.0', lines)
+            self.assertIn('http_request_db_queries_count{view="bulk_employee"} 1.0', lines)
+
+            metrics.write([sample for i in range(2000) for sample in metrics.REQUESTS.samples(view=f'view-{i}')])
+            metrics.write(metrics.REQUESTS.samples(view='view-0'))
+            totals = metrics.read_totals()
+            self.assertEqual(totals[metrics.sample_key('http_requests_total', {'view': 'view-0'})], 2)
+            self.assertEqual(totals[metrics.sample_key('http_requests_total', {'view': 'view-1999'})], 1)
+
+            # The file of an exited worker is folded into the archive; its counts stay in the totals.
+            metrics.archive_process(worker.pid)
+            self.assertFalse(os.path.exists(os.path.join(directory, f'metrics-{worker.pid}.db')))
+            self.assertEqual(metrics.read_totals(), totals)
+            metrics.clear()
+            self.assertEqual(metrics.read_totals(), {})
+        print(f"\nMetrics across processes ✔ ({response.status_code})")
+
+
+
+
+# -------------------------------------- INDEXES --------------------------------------
+
+
+class IndexUsageTestCase(APITestCase):
+    """
+    Every whitelisted ordering and filter must be served by an index. The plans
+    are read with EXPLAIN on a seeded dataset that is large enough for the
+    planner to prefer a sequential scan whenever no index fits.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        companies = Company.objects.bulk_create([
+            Company(name=f"Index Cég {i}", address=f"{1000 + i} Budapest Fő utca {i}", phone=f"06301{i:06d}",
+                    description=None if i % 3 else f"Leírás {i}", employee_count=i % 50)
+            for i in range(500)
+        ])
+        Employee.objects.bulk_create([
+            Employee(name=f"Index Dolgozó {i}", email=f"index-{i}@example.com",
+                     job_title=Employee.JOB_TITLES[i % 4][0], age=18 + i % 50, company=companies[i % 500])
+            for i in range(20000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.company_ids = [company.id for company in companies[:20]]
+
+    def sequential_scans(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            return re.findall(r'Seq Scan on (api_\w+)', plan)
+        return re.findall(r'\bSCAN (api_\w+)$', plan, re.MULTILINE)
+
+    def pages(self, queryset, ordering, params=None):
+        yield f'{ordering} (offset)', queryset.order_by(ordering)[:20]
+        request = Request(APIRequestFactory().get('/', params or {}))
+        yield f'{ordering} (cursor)', KeysetPagination(ordering).page_queryset(queryset, request)
+
+    def assertIndexed(self, cases):
+        scans = {name: self.sequential_scans(queryset) for name, queryset in cases}
+        self.assertEqual({name: tables for name, tables in scans.items() if tables}, {})
+
+
+    def test_company_orderings_use_indexes(self):
+        cases = []
+        for field in COMPANY_ORDERING_FIELDS:
+            for ordering in (field, f'-{field}'):
+                cases += self.pages(Company.objects.all(), ordering)
+        cases += self.pages(filter_companies(Company.objects.all(), {'employees': '7'}), 'name')
+        self.assertIndexed(cases)
+        print(f"\nCompany orderings use indexes ✔ ({len(cases)} queries)")
+
+    def test_employee_orderings_and_filters_use_indexes(self):
+        cases = []
+        for field in ['id', *EMPLOYEE_ORDERING_FIELDS]:
+            for ordering in (field, f'-{field}'):
+                cases += self.pages(Employee.objects.all(), ordering)
+        for params in [{'job_title': 'dev'}, {'age': '30'}, {'job_title': 'manager', 'age': '30'}]:
+            cases += self.pages(filter_employees(Employee.objects.all(), params), 'id', params)
+        cases.append((
+            'with_employees',
+            Employee.objects.filter(company_id__in=self.company_ids).values('company_id', 'id', 'name', 'job_title')
+        ))
+        self.assertIndexed(cases)
+        print(f"\nEmployee orderings and filters use indexes ✔ ({len(cases)} queries)")
+
+    @skipUnless(connection.vendor == 'postgresql', "Substring filters and search are only indexed on PostgreSQL (trigram and GIN indexes).")
+    def test_substring_filters_and_search_use_indexes(self):
+        cases = []
+        company_values = {'name': 'Cég 12', 'address': 'Fő utca 12', 'phone': '000012', 'description': 'Leírás 12'}
+        for param, value in company_values.items():
+            cases += self.pages(filter_companies(Company.objects.all(), {param: value}), 'name', {param: value})
+        cases.append(('company search', order_queryset(search_companies(Company.objects.all(), 'cég 12'), 'name', 'cég 12')[:20]))
+
+        employee_values = {'name': 'Dolgozó 12', 'email': 'index-12@', 'company_name': 'Cég 12'}
+        for param, value in employee_values.items():
+            cases += self.pages(filter_employees(Employee.objects.all(), {param: value}), 'id', {param: value})
+        cases.append(('employee search', order_queryset(search_employees(Employee.objects.all(), 'dolgozó 12'), 'id', 'dolgozó 12')[:20]))
+        self.assertIndexed(cases)
+        print(f"\nSubstring filters and search use indexes ✔ ({len(cases)} queries)")
+
+
+
+
+# -------------------------------------- REPLICAS --------------------------------------
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_go_to_replicas_and_writes_to_the_primary(self):
+        self.assertIn(self.router.db_for_read(Company), ['replica1', 'replica2'])
+        self.assertEqual(self.router.db_for_write(Company), 'default')
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Employee), 'default')
+        with use_primary(False):
+            self.assertIn(self.router.db_for_read(Employee), ['replica1', 'replica2'])
+        with patch.object(connections['default'], 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Employee), 'default')
+        with self.settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.router.db_for_read(Employee), 'default')
+        self.assertEqual(self.router.db_for_read(DatabaseCache('api_replica_pins', {}).cache_model_class), 'default')
+        print("\nReplica routing ✔")
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        middleware = PrimaryPinMiddleware(lambda request: HttpResponse(self.router.db_for_read(Company)))
+        factory = RequestFactory()
+
+        self.assertIn(middleware(factory.get('/api/company/')).content, [b'replica1', b'replica2'])
+
+        response = middleware(factory.post('/api/company/'))
+        self.assertEqual(response.content, b'default')
+        self.assertEqual(response.cookies['db_primary']['max-age'], 5)
+
+        pinned = factory.get('/api/company/')
+        pinned.COOKIES['db_primary'] = '1'
+        response = middleware(pinned)
+        self.assertEqual(response.content, b'default')
+        self.assertNotIn('db_primary', response.cookies)
+
+        with self.settings(DATABASE_REPLICAS=[]):
+            with self.assertRaises(MiddlewareNotUsed):
+                PrimaryPinMiddleware(lambda request: HttpResponse())
+        print(f"\nPrimary pinning ✔ ({response.status_code})")
+
+    def test_replica_pin_write_times(self):
+        write_times().clear()
+        self.assertFalse(recently_written(['api.company']))
+        bump_generations('api.company')
+        response_cache().clear()
+        self.assertTrue(recently_written(['api.company']))
+        self.assertFalse(recently_written(['api.bulkjob']))
+        with self.settings(REPLICA_PIN_SECONDS=0):
+            self.assertFalse(recently_written(['api.company']))
+        print("\nReplica pin write times ✔")
+
+
+SEPARATE_REPLICAS = [
+    alias for alias in settings.DATABASE_REPLICAS if not settings.DATABASES[alias].get('TEST', {}).get('MIRROR')
+]
+
+
+@skipUnless(SEPARATE_REPLICAS, "Needs a replica with its own test database: set DB_REPLICA_HOSTS and DB_REPLICA_SEPARATE_TEST=1.")
+class ReplicaDatabaseTestCase(APITransactionTestCase):
+    """
+    Runs against two aliases with separate databases, so every response shows
+    which one it was read from: nothing is replicated between them.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        response_cache().clear()
+
+    def test_reads_follow_the_router(self):
+        payload = {"name": "Elsődleges Kft.", "address": "1111 Budapest Fő utca 1", "phone": "06301234567"}
+        response = self.client.post(reverse('companies'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        url = reverse('company_detail', args=[response.data['id']])
+
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client_class().get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+        # The list is recomputed on the primary while the write may not be replicated yet.
+        self.assertEqual(len(self.client_class().get(reverse('companies')).data['results']), 1)
+        with self.settings(REPLICA_PIN_SECONDS=0):
+            self.assertEqual(self.client_class().get(reverse('companies'), {'page_size': 5}).data['results'], [])
+        print(f"\nReplica reads ✔ ({response.status_code})")
+
+    def test_bulk_job_reads_from_the_primary(self):
+        company = Company.objects.create(name="Elsődleges Kft.", address="1111 Budapest Fő utca 1", phone="06301234567")
+        Employee.objects.create(name="Foglalt", email="foglalt@example.com", job_title="tester", age=30, company=company)
+        BulkJob.objects.enqueue('CREATE', [
+            {"name": "Új", "email": "uj@example.com", "job_title": "tester", "age": 30, "company": str(company.id)},
+            {"name": "Foglalt", "email": "foglalt@example.com", "job_title": "tester", "age": 30, "company": str(company.id)},
+        ])
+
+        # Nothing reached the replica, so any worker read sent there would see neither the company nor the email.
+        with CaptureQueriesContext(connections[SEPARATE_REPLICAS[0]]) as replica_queries:
+            self.assertEqual(run_pending_jobs('test-worker'), 1)
+        job = BulkJob.objects.using('default').get()
+        self.assertEqual((job.status, job.result), ('succeeded', {'created': 1, 'failed': 1}))
+        self.assertIn('email', job.errors[0]['errors'])
+        self.assertEqual(len(replica_queries), 0)
+        print("\nBulk job primary reads ✔")
@@ -1,12 +1,21 @@
 from django.urls import path
-from .views import company_list, manage_company, employee_list, manage_employee, bulk_manage_employees
+from .views import (
+    company_list, manage_company, company_export, employee_list, manage_employee, employee_export, employee_stats,
+    bulk_manage_companies, bulk_manage_employees, bulk_employee_job, metrics
+)
 
 urlpatterns = [
     path('company/', company_list, name='companies'),
     path('company/<uuid:pk>/', manage_company, name='company_detail'),
+    path('company/export/', company_export, name='company_export'),
+    path('company/bulk/', bulk_manage_companies, name='bulk_company'),
     path('employee/', employee_list, name='employees'),
     path('employee/<uuid:pk>/', manage_employee, name='employee_detail'),
+    path('employee/export/', employee_export, name='employee_export'),
+    path('employee/stats/', employee_stats, name='employee_stats'),
     path('employee/bulk/', bulk_manage_employees, name='bulk_employee'),
+    path('employee/bulk/jobs/<uuid:pk>/', bulk_employee_job, name='bulk_employee_job'),
+    path('metrics/', metrics, name='metrics'),
 ]
 
 
@@ -1,78 +1,89 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, parser_classes
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import transaction
+from django.db import IntegrityError
 from django.db.models.signals import pre_delete
-from django.db.models import Count, Q
+from django.http import HttpResponse
 from django.dispatch import receiver
+from django.urls import reverse
+from django.views.decorators.http import condition
 from django.core.exceptions import ValidationError
-from .models import Company, Employee
-from .serializer import CompanySerializer, EmployeeSerializer
-from rest_framework.pagination import PageNumberPagination
-
-
-class CustomPagination(PageNumberPagination):
-    page_size = 5
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+from .models import BulkJob, Company, Employee
+from .serializer import BulkJobSerializer, CompanySerializer, EmployeeSerializer, read_data
+from .bulk import (
+    BULK_UPDATE_BATCH_SIZE, MAX_BULK_UPDATE_BATCH_SIZE, checked_company_deletions, create_companies,
+    create_employees, delete_companies, delete_employees, update_companies, update_employees
+)
+from .filters import (
+    COMPANY_ORDERING_FIELDS, EMPLOYEE_ORDERING_FIELDS, filter_companies, filter_employees,
+    order_queryset, search_companies, search_employees
+)
+from .pagination import get_paginator
+from .fields import (
+    COMPANY_FIELDS, EMPLOYEE_FIELDS, employee_queryset, only_columns, requested_fields, wants_employees
+)
+from .renderers import MessagePackParser
+from .cache import cached_response, coalesced
+from .conditional import (
+    company_etag, company_last_modified, employee_etag, employee_last_modified, list_etag
+)
+from .metrics import exposition, observe_bulk_batch, read_totals
+from .stats import DEFAULT_AGE_BUCKET, employee_statistics
+from .export import (
+    COMPANY_EXPORT_FIELDS, EMPLOYEE_CSV_COLUMNS, EXPORT_FORMATS, company_rows, csv_lines,
+    employee_rows, ndjson_lines, streaming_export
+)
 
 
 
 @receiver(pre_delete, sender = Company)
 def prevent_company_deletion(sender, instance, **kwargs):
+    if instance.pk in checked_company_deletions.get():
+        return
     if instance.employees.exists():
         raise ValidationError(message = "This company cannot be deleted because it has employees.")
 
 
-def extended_employees(request, serializer_class, data, fields=None, many=True):
+def invalid_ordering(ordering, valid_ordering_fields):
+    ordering_field = ordering.lstrip('-')
+    if ordering_field not in valid_ordering_fields:
+        return Response(
+            {"error": f"The submitted order query ({ordering_field}) is invalid! Use one of: {valid_ordering_fields}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return None
 
-    with_employees = request.GET.get('with_employees', '0') == '1'
-    default_fields = ['id', 'name', 'address', 'phone', 'description', 'employee_count']
 
-    if with_employees:
-        fields = default_fields + ['employees']
+def extended_employees(request, serializer_class, data, fields=None, many=True):
+
+    if wants_employees(request) and 'employees' not in fields:
+        fields = fields + ['employees']
 
-    serializer = serializer_class(data, many=many, fields=fields)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return Response(read_data(serializer_class, data, many=many, fields=fields), status=status.HTTP_200_OK)
 
 
 
 
 
+@condition(etag_func=list_etag)
 @api_view(['GET', 'POST'])
+@cached_response('company_list', ['api.company', 'api.employee'])
 def company_list(request):
     if request.method == 'GET':
-        valid_ordering_fields = ['name', 'address', 'phone', 'description', 'employee_count']
-        all_company = Company.objects.all()
-
-        name = request.GET.get('name', None)
-        address = request.GET.get('address', None)
-        phone = request.GET.get('phone', None)
-        description = request.GET.get('description', None)
-        employees = request.GET.get('employees', None)
-
-        if name:
-            all_company = all_company.filter(name__icontains=name)
-        if address:
-            all_company = all_company.filter(address__icontains=address)
-        if phone:
-            all_company = all_company.filter(phone__icontains=phone)
-        if description:
-            all_company = all_company.filter(description__icontains=description)
-        if employees:
-            all_company = all_company.annotate(employee_count=Count('employees')).filter(employee_count=int(employees))
-
-
+        fields, error = requested_fields(request, COMPANY_FIELDS, ['employees'])
+        if error:
+            return error
+        with_employees = wants_employees(request)
+        fields = [field for field in fields if field != 'employees']
+
+        all_company = filter_companies(
+            Company.objects.only(*only_columns(Company, fields, request.GET.get('ordering') or 'name')), request.GET
+        )
 
         search = request.GET.get('search', None)
         if search:
-            all_company = all_company.filter(
-                Q(id__icontains=search) |
-                Q(name__icontains=search) |
-                Q(address__icontains=search) |
-                Q(phone__icontains=search) |
-                Q(description__icontains=search)
-            )
+            all_company = search_companies(all_company, search)
             if not all_company.exists():
                 return Response(
                     {"message": f"No companies found matching the search criteria. ({search})"},
@@ -81,27 +92,22 @@ def company_list(request):
 
         ordering = request.GET.get('ordering', None)
         if ordering:
-            ordering_field = ordering.lstrip('-')
-            if ordering_field not in valid_ordering_fields:
-                return Response(
-                    {"error": f"The submitted order query ({ordering_field}) is invalid! Use one of: {valid_ordering_fields}"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            if ordering_field == 'employee_count':
-                all_company = all_company.annotate(employee_count=Count('employees'))
-            all_company = all_company.order_by(ordering)
+            error = invalid_ordering(ordering, COMPANY_ORDERING_FIELDS)
+            if error:
+                return error
+            all_company = order_queryset(all_company, ordering)
         else:
-            all_company = all_company.order_by('name')
+            ordering = 'name'
+            all_company = order_queryset(all_company, ordering, search)
 
         all_company = all_company.distinct()
 
 
-        paginator = CustomPagination()
+        paginator = get_paginator(request, ordering)
         paginated_companies = paginator.paginate_queryset(all_company, request)
 
 
-        if request.GET.get('with_employees') == '1':
+        if with_employees:
             company_ids = [company.id for company in paginated_companies]
             employees_by_company = (
                 Employee.objects.filter(company_id__in=company_ids)
@@ -114,16 +120,12 @@ def company_list(request):
 
             serialized_companies = []
             for company in paginated_companies:
-                company_data = CompanySerializer(
-                    company, fields=['id', 'name', 'address', 'phone', 'description', 'employee_count']
-                ).data
+                company_data = read_data(CompanySerializer, company, fields=fields)
                 company_data['employees'] = employees_map.get(company.id, [])
                 serialized_companies.append(company_data)
         else:
 
-            serialized_companies = CompanySerializer(
-                paginated_companies, many=True, fields=['id', 'name', 'address', 'phone', 'description', 'employee_count']
-            ).data
+            serialized_companies = read_data(CompanySerializer, paginated_companies, many=True, fields=fields)
 
 
         return paginator.get_paginated_response(serialized_companies)
@@ -139,10 +141,51 @@ def company_list(request):
 
 
 
+@api_view(['GET'])
+def company_export(request):
+    export_format = request.GET.get('export_format', 'ndjson')
+    with_employees = request.GET.get('with_employees') == '1'
+
+    if export_format not in EXPORT_FORMATS:
+        return Response({"error": f"Invalid export format! Use one of: {list(EXPORT_FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    if with_employees and export_format == 'csv':
+        return Response({"error": "Employees can only be inlined in the ndjson export."}, status=status.HTTP_400_BAD_REQUEST)
+
+    all_company = filter_companies(Company.objects.all(), request.GET)
+
+    search = request.GET.get('search', None)
+    if search:
+        all_company = search_companies(all_company, search)
+
+    ordering = request.GET.get('ordering', None)
+    if ordering:
+        error = invalid_ordering(ordering, COMPANY_ORDERING_FIELDS)
+        if error:
+            return error
+        all_company = order_queryset(all_company, ordering)
+    else:
+        all_company = order_queryset(all_company, 'name', search)
+
+    rows = company_rows(all_company, with_employees=with_employees)
+    if export_format == 'csv':
+        return streaming_export(csv_lines(rows, COMPANY_EXPORT_FIELDS), export_format, 'companies')
+    return streaming_export(ndjson_lines(rows), export_format, 'companies')
+
+
+
+
+@condition(etag_func=company_etag, last_modified_func=company_last_modified)
 @api_view(['GET', 'PATCH', 'DELETE'])
 def manage_company(request, pk):
+    companies = Company.objects.all()
+    if request.method == 'GET':
+        fields, error = requested_fields(request, COMPANY_FIELDS, ['employees'])
+        if error:
+            return error
+        companies = companies.only(*only_columns(Company, fields))
+
     try:
-        company = Company.objects.get(pk=pk)
+        company = companies.get(pk=pk)
     except Company.DoesNotExist:
         return Response({'error': 'Company not found!'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -150,7 +193,7 @@ def manage_company(request, pk):
     if request.method == 'GET':
         return extended_employees(
             request, CompanySerializer, company,
-            fields=['id', 'name', 'address', 'phone', 'description', 'employee_count'],
+            fields=[field for field in fields if field != 'employees'],
             many = False
         )
 
@@ -171,28 +214,16 @@ def manage_company(request, pk):
 
 
 
+@condition(etag_func=list_etag)
 @api_view(['GET', 'POST'])
+@coalesced('employee_list', ['api.employee', 'api.company'])
 def employee_list(request):
     if request.method == 'GET':
-        valid_ordering_fields = ['name', 'email', 'job_title', 'age', 'company']
-        all_employee = Employee.objects.all()
-
-        name = request.GET.get('name', None)
-        email = request.GET.get('email', None)
-        job_title = request.GET.get('job_title', None)
-        age = request.GET.get('age', None)
-        company_name = request.GET.get('company_name', None)
-
-        if name:
-            all_employee = all_employee.filter(name__icontains=name)
-        if email:
-            all_employee = all_employee.filter(email__icontains=email)
-        if job_title:
-            all_employee = all_employee.filter(job_title__icontains=job_title)
-        if age:
-            all_employee = all_employee.filter(age=age)
-        if company_name:
-            all_employee = all_employee.filter(company__name__icontains=company_name)
+        fields, error = requested_fields(request, EMPLOYEE_FIELDS)
+        if error:
+            return error
+
+        all_employee = filter_employees(employee_queryset(fields, request.GET.get('ordering') or 'id'), request.GET)
 
         if not all_employee.exists():
             return Response(
@@ -202,14 +233,7 @@ def employee_list(request):
 
         search = request.GET.get('search', None)
         if search:
-            all_employee = all_employee.filter(
-                Q(id__icontains=search) |
-                Q(name__icontains=search) |
-                Q(email__icontains=search) |
-                Q(job_title__icontains=search) |
-                Q(age__icontains=search) |
-                Q(company__name__icontains=search)
-            )
+            all_employee = search_employees(all_employee, search)
             if not all_employee.exists():
                 return Response(
                     {"message": f"No employees found matching the search criteria. ({search})"},
@@ -218,20 +242,17 @@ def employee_list(request):
 
         ordering = request.GET.get('ordering', None)
         if ordering:
-            ordering_field = ordering.lstrip('-')
-            if ordering_field not in valid_ordering_fields:
-                return Response(
-                    {"error": f"The submitted order query ({ordering_field}) is invalid! Use one of: {valid_ordering_fields}"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            all_employee = all_employee.order_by(ordering)
+            error = invalid_ordering(ordering, EMPLOYEE_ORDERING_FIELDS)
+            if error:
+                return error
+            all_employee = order_queryset(all_employee, ordering)
         else:
-            all_employee = all_employee.order_by('id')
+            ordering = 'id'
+            all_employee = order_queryset(all_employee, ordering, search)
 
-        paginator = CustomPagination()
+        paginator = get_paginator(request, ordering)
         paginated_data = paginator.paginate_queryset(all_employee, request)
-        serializer = EmployeeSerializer(paginated_data, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        return paginator.get_paginated_response(read_data(EmployeeSerializer, paginated_data, many=True, fields=fields))
 
     if request.method == 'POST':
         serializer = EmployeeSerializer(data=request.data, context={'request': request})
@@ -245,15 +266,74 @@ def employee_list(request):
 
 
 
+@api_view(['GET'])
+def employee_export(request):
+    export_format = request.GET.get('export_format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return Response({"error": f"Invalid export format! Use one of: {list(EXPORT_FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    all_employee = filter_employees(Employee.objects.all(), request.GET)
+
+    search = request.GET.get('search', None)
+    if search:
+        all_employee = search_employees(all_employee, search)
+
+    ordering = request.GET.get('ordering', None)
+    if ordering:
+        error = invalid_ordering(ordering, EMPLOYEE_ORDERING_FIELDS)
+        if error:
+            return error
+        all_employee = order_queryset(all_employee, ordering)
+    else:
+        all_employee = order_queryset(all_employee, 'id', search)
+
+    if export_format == 'csv':
+        rows = employee_rows(all_employee, nested=False)
+        return streaming_export(csv_lines(rows, EMPLOYEE_CSV_COLUMNS), export_format, 'employees')
+    return streaming_export(ndjson_lines(employee_rows(all_employee)), export_format, 'employees')
+
+
+
+
+@condition(etag_func=list_etag)
+@api_view(['GET'])
+@cached_response('employee_stats', ['api.employee', 'api.company'])
+def employee_stats(request):
+    try:
+        age_bucket = int(request.GET.get('age_bucket', DEFAULT_AGE_BUCKET))
+        if not 1 <= age_bucket <= 100:
+            raise ValueError
+    except ValueError:
+        return Response({"error": "The age_bucket must be a whole number between 1 and 100!"}, status=status.HTTP_400_BAD_REQUEST)
+
+    all_employee = filter_employees(Employee.objects.all(), request.GET)
+
+    search = request.GET.get('search', None)
+    if search:
+        all_employee = search_employees(all_employee, search)
+
+    return Response(employee_statistics(all_employee, age_bucket), status=status.HTTP_200_OK)
+
+
+
+
+@condition(etag_func=employee_etag, last_modified_func=employee_last_modified)
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 def manage_employee(request, pk):
+    employees = Employee.objects.select_related('company')
+    if request.method == 'GET':
+        fields, error = requested_fields(request, EMPLOYEE_FIELDS)
+        if error:
+            return error
+        employees = employee_queryset(fields)
+
     try:
-        employee = Employee.objects.get(pk=pk)
+        employee = employees.get(pk=pk)
     except Employee.DoesNotExist:
         return Response({'error': 'Employee not found!'}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
-        return Response(EmployeeSerializer(employee).data, status=status.HTTP_200_OK)
+        return Response(read_data(EmployeeSerializer, employee, fields=fields), status=status.HTTP_200_OK)
 
     if request.method in ['PUT', 'PATCH']:
         partial = request.method == 'PATCH'
@@ -270,7 +350,10 @@ def manage_employee(request, pk):
 
 
 @api_view(['POST', 'PUT', 'PATCH'])
+@parser_classes([JSONParser, MessagePackParser, FormParser, MultiPartParser])
 def bulk_manage_employees(request):
+    run_async = request.GET.get('async') == '1'
+
     if request.method == 'POST':
         employees_data = request.data.get('employees', [])
         action = request.data.get('action', '').upper()
@@ -278,44 +361,42 @@ def bulk_manage_employees(request):
         if not isinstance(employees_data, list):
             return Response({'error': 'Employees data must be a list.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if action == 'CREATE':
-            serializer = EmployeeSerializer(data=employees_data, many=True, context={'request': request})
-            
-            if serializer.is_valid():
-                try:
-
-                    employees = [Employee(**data) for data in serializer.validated_data]
-                    Employee.objects.bulk_create(employees)
+        if action in ('CREATE', 'DELETE'):
+            observe_bulk_batch(request, action, len(employees_data))
 
-                    
-                    return Response({'message': f'{len(employees)} employees added.'}, status=status.HTTP_201_CREATED)
+        if action == 'CREATE':
+            if run_async:
+                return enqueued_job_response(request, BulkJob.objects.enqueue(action, employees_data))
 
-                except Exception as e:
-                    return Response({'error': f'Error occurred: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                created_count, errors = create_employees(employees_data, context={'request': request})
+            except Exception as e:
+                return Response({'error': f'Error occurred: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
+            if errors:
+                row_errors = [{} for _ in employees_data]
+                for index, detail in errors:
+                    row_errors[index] = detail
+                return Response({'error': row_errors}, status=status.HTTP_400_BAD_REQUEST)
 
-            return Response({'error': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'message': f'{created_count} employees added.'}, status=status.HTTP_201_CREATED)
         
 
         if action == 'DELETE':
-            employee_ids = [data.get('id') for data in employees_data if 'id' in data]
+            employee_ids = [data.get('id') for data in employees_data if isinstance(data, dict) and 'id' in data]
             
             if not employee_ids:
                 return Response({'error': 'At least one ID is required for deletion.'}, status=status.HTTP_400_BAD_REQUEST)
-            
-
-            existing_employees = Employee.objects.filter(id__in=employee_ids)
-            existing_ids = set(str(emp.id) for emp in existing_employees)
 
+            if run_async:
+                return enqueued_job_response(request, BulkJob.objects.enqueue(action, employees_data))
 
-            non_existing_ids = [emp_id for emp_id in employee_ids if str(emp_id) not in existing_ids]
-
-            deleted_count, _ = existing_employees.delete()
+            deleted_count, non_existing_ids = delete_employees(employee_ids)
 
             if deleted_count > 0:
                 if non_existing_ids:
                     return Response({
-                        'message': f'{deleted_count} employees deleted. However, the following employee IDs do not exist: {", ".join(non_existing_ids)}'
+                        'message': f'{deleted_count} employees deleted. However, the following employee IDs do not exist: {", ".join(map(str, non_existing_ids))}'
                     }, status=status.HTTP_400_BAD_REQUEST)
                 else:
                     return Response({'message': f'{deleted_count} employees deleted.'}, status=status.HTTP_200_OK)
@@ -323,47 +404,142 @@ def bulk_manage_employees(request):
             elif deleted_count == 0 and non_existing_ids:
                 return Response({'error': 'Could not delete any entries. The submitted IDs are invalid.'}, status=status.HTTP_400_BAD_REQUEST)
             
-    elif request.method in ['PUT', 'PATCH']:   
+    elif request.method in ['PUT', 'PATCH']:
         partial = request.method == 'PATCH'
         employees_data = request.data
 
-        with transaction.atomic():
-            employees_to_update = []
-            update_fields = []
-            errors = []
+        if not isinstance(employees_data, list):
+            return Response({'error': 'Employees data must be a list.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        observe_bulk_batch(request, request.method, len(employees_data))
 
-            for data in employees_data:
-                employee_id = data.get('id')
-                if not employee_id:
-                    errors.append({'error': 'Each update must include an ID.'})
-                    continue
+        if run_async:
+            return enqueued_job_response(request, BulkJob.objects.enqueue(request.method, employees_data))
 
-                try:
-                    employee = Employee.objects.get(pk=employee_id)
-                except Employee.DoesNotExist:
-                    errors.append({'error': f'Employee ID {employee_id} not found.'})
-                    continue
+        try:
+            batch_size = min(max(int(request.GET.get('batch_size', BULK_UPDATE_BATCH_SIZE)), 1), MAX_BULK_UPDATE_BATCH_SIZE)
+        except ValueError:
+            return Response({'error': 'batch_size must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            updated_count, errors = update_employees(
+                employees_data, context={'request': request}, partial=partial, batch_size=batch_size
+            )
+        except IntegrityError as e:
+            return Response({'error': f'Error occurred: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
+        if errors:
+            return Response({'errors': [detail for _, detail in errors]}, status=status.HTTP_400_BAD_REQUEST)
 
-                serializer = EmployeeSerializer(employee, data=data, partial=partial, context={'request': request})
-                if serializer.is_valid():
-                    updated_employee = serializer.save()
+        return Response({'message': f'{updated_count} employees updated.'}, status=status.HTTP_200_OK)
+        
+    return Response({'error': 'Invalid action. Make sure either "CREATE" or "DELETE" is provided.'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-                    update_fields = [field for field in serializer.validated_data.keys()]
-                    employees_to_update.append(updated_employee)
-                else:
-                    errors.append(serializer.errors)
 
 
+@api_view(['POST', 'PATCH'])
+@parser_classes([JSONParser, MessagePackParser, FormParser, MultiPartParser])
+def bulk_manage_companies(request):
+    if request.method == 'POST':
+        companies_data = request.data.get('companies', [])
+        action = request.data.get('action', '').upper()
+
+        if not isinstance(companies_data, list):
+            return Response({'error': 'Companies data must be a list.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if action in ('CREATE', 'DELETE'):
+            observe_bulk_batch(request, action, len(companies_data))
+
+        if action == 'CREATE':
+            try:
+                created_count, employee_count, errors = create_companies(companies_data, context={'request': request})
+            except IntegrityError as e:
+                return Response({'error': f'Error occurred: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+
             if errors:
-                return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+                row_errors = [{} for _ in companies_data]
+                for index, detail in errors:
+                    row_errors[index] = detail
+                return Response({'error': row_errors}, status=status.HTTP_400_BAD_REQUEST)
 
+            return Response(
+                {'message': f'{created_count} companies added with {employee_count} employees.'},
+                status=status.HTTP_201_CREATED
+            )
+
+        if action == 'DELETE':
+            company_ids = [data.get('id') for data in companies_data if isinstance(data, dict) and 'id' in data]
 
-            if employees_to_update:
-                Employee.objects.bulk_update(employees_to_update, update_fields)
+            if not company_ids:
+                return Response({'error': 'At least one ID is required for deletion.'}, status=status.HTTP_400_BAD_REQUEST)
 
-            return Response({'message': f'{len(employees_to_update)} employees updated.'}, status=status.HTTP_200_OK)
-        
-    return Response({'error': 'Invalid action. Make sure either "CREATE" or "DELETE" is provided.'}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+            deleted_count, blocked, non_existing_ids = delete_companies(company_ids)
+
+            if blocked or non_existing_ids:
+                return Response({
+                    'message': f'{deleted_count} companies deleted.',
+                    'blocked': [
+                        {'id': company_id, 'employee_count': count,
+                         'error': 'This company cannot be deleted because it has employees.'}
+                        for company_id, count in blocked.items()
+                    ],
+                    'not_found': non_existing_ids,
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            return Response({'message': f'{deleted_count} companies deleted.'}, status=status.HTTP_200_OK)
+
+    elif request.method == 'PATCH':
+        companies_data = request.data
+
+        if not isinstance(companies_data, list):
+            return Response({'error': 'Companies data must be a list.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        observe_bulk_batch(request, request.method, len(companies_data))
+
+        try:
+            batch_size = min(max(int(request.GET.get('batch_size', BULK_UPDATE_BATCH_SIZE)), 1), MAX_BULK_UPDATE_BATCH_SIZE)
+        except ValueError:
+            return Response({'error': 'batch_size must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            updated_count, errors = update_companies(companies_data, context={'request': request}, batch_size=batch_size)
+        except IntegrityError as e:
+            return Response({'error': f'Error occurred: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if errors:
+            return Response({'errors': [detail for _, detail in errors]}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'message': f'{updated_count} companies updated.'}, status=status.HTTP_200_OK)
+
+    return Response({'error': 'Invalid action. Make sure either "CREATE" or "DELETE" is provided.'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+
+
+def enqueued_job_response(request, job):
+    return Response({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': request.build_absolute_uri(reverse('bulk_employee_job', args=[job.id])),
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+
+
+@api_view(['GET'])
+def bulk_employee_job(request, pk):
+    try:
+        job = BulkJob.objects.defer('payload').get(pk=pk)
+    except BulkJob.DoesNotExist:
+        return Response({'error': 'Job not found!'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(BulkJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+
+
+@api_view(['GET'])
+def metrics(request):
+    """Request metrics of every worker process, in the Prometheus text format."""
+    return HttpResponse(exposition(read_totals()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,102 @@
+"""
+Shared helpers for the scripts in this folder.
+
+The benchmarks run against the database configured in ``Excercize.settings``
+(the docker-compose Postgres by default). They seed their own rows, all of
+which are marked with the ``bench-`` prefix, and ``--cleanup`` removes them again.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Excercize.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from api.models import Company, Employee  # noqa: E402
+
+
+FIRST_NAMES = ['Aladár', 'Béla', 'Csilla', 'Dóra', 'Erzsébet', 'Ferenc', 'Gábor', 'Hajnalka', 'István', 'Judit']
+LAST_NAMES = ['Kovács', 'Nagy', 'Tóth', 'Szabó', 'Horváth', 'Varga', 'Kiss', 'Molnár', 'Németh', 'Farkas']
+STREETS = ['Fő utca', 'Petőfi utca', 'Kossuth tér', 'Rákóczi út', 'Ady Endre utca', 'Dózsa György út']
+JOB_TITLES = [choice for choice, _ in Employee.JOB_TITLES]
+
+
+def argument_parser(description, employees=100_000):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--employees', type=int, default=employees, help="Number of seeded employees.")
+    parser.add_argument('--companies', type=int, default=None, help="Number of seeded companies (default: employees / 50).")
+    parser.add_argument('--repeat', type=int, default=20, help="Timed runs per case.")
+    parser.add_argument('--cleanup', action='store_true', help="Delete the seeded rows when done.")
+    return parser
+
+
+def seed(employees, companies=None, batch_size=10_000):
+    """Top the bench- dataset up to the requested size, reusing rows from earlier runs."""
+    companies = companies or max(1, employees // 50)
+    rng = random.Random(42)
+
+    existing_companies = Company.objects.filter(name__startswith='bench-').count()
+    new_companies = [
+        Company(
+            name=f'bench-{i} {rng.choice(LAST_NAMES)} Kft.',
+            address=f'{rng.randint(1000, 9999)} Budapest {rng.choice(STREETS)} {rng.randint(1, 200)}',
+            phone=f'06{rng.randint(10**8, 10**9 - 1)}',
+            description=rng.choice([None, 'Szoftverfejlesztés', 'Tanácsadás', 'Kereskedelem']),
+        )
+        for i in range(existing_companies, companies)
+    ]
+    Company.objects.bulk_create(new_companies, batch_size=batch_size)
+    company_ids = list(Company.objects.filter(name__startswith='bench-').values_list('id', flat=True))
+
+    existing_employees = Employee.objects.filter(email__startswith='bench-').count()
+    for start in range(existing_employees, employees, batch_size):
+        with transaction.atomic():
+            Employee.objects.bulk_create([
+                Employee(
+                    name=f'{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}',
+                    email=f'bench-{i}@example.com',
+                    job_title=rng.choice(JOB_TITLES),
+                    age=rng.randint(16, 70),
+                    company_id=rng.choice(company_ids),
+                )
+                for i in range(start, min(start + batch_size, employees))
+            ])
+        print(f'  seeded {min(start + batch_size, employees)} / {employees} employees', end='\r', flush=True)
+
+    Company.objects.filter(name__startswith='bench-').recount_employees()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE api_company')
+            cursor.execute('ANALYZE api_employee')
+
+
+def cleanup():
+    Employee.objects.filter(email__startswith='bench-').delete()
+    Company.objects.filter(name__startswith='bench-').delete()
+
+
+def measure(fn, repeat):
+    """Run ``fn`` ``repeat`` times after one warm-up call and return (p50, p99) in milliseconds."""
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    for row in [headers, ['-' * width for width in widths], *rows]:
+        print('  '.join(str(cell).ljust(width) for cell, width in zip(row, widths)))
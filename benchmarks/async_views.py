@@ -0,0 +1,130 @@
+"""
+Throughput and latency of the sync (WSGI) and async (ASGI) deployments.
+
+    docker compose up -d db web asgi
+    python benchmarks/async_views.py --employees 100000 --connections 200
+
+``web`` serves Excercize.wsgi with gunicorn's sync workers, ``asgi`` serves
+Excercize.asgi (the async views) with uvicorn workers. Both talk to the same
+database. Every case keeps ``--connections`` keep-alive connections busy for
+``--duration`` seconds and reports requests per second with p50/p99 latency.
+The response cache is bypassed with a unique query parameter per request, so
+the case measures the views and not the cache.
+"""
+import asyncio
+import itertools
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from _common import Company, Employee, argument_parser, cleanup, print_table, seed
+
+
+def cases():
+    company = Company.objects.filter(name__startswith='bench-').values_list('id', flat=True).first()
+    employee = Employee.objects.filter(email__startswith='bench-').values_list('id', flat=True).first()
+    return [
+        ('company list', '/api/company/?page_size=20&nocache={n}'),
+        ('employee list', '/api/employee/?page_size=20&ordering=age&nocache={n}'),
+        ('company detail', f'/api/company/{company}/?with_employees=1&nocache={{n}}'),
+        ('employee detail', f'/api/employee/{employee}/?nocache={{n}}'),
+    ]
+
+
+async def read_response(reader):
+    """Read one response and return ``(status, keep_alive)``."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding') == 'chunked':
+        while (size := int((await reader.readline()).strip(), 16)):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    return int(status_line.split()[1]), headers.get('connection', '').lower() != 'close'
+
+
+async def worker(base_url, path, deadline, counter, latencies, errors):
+    """
+    One client connection. gunicorn's sync workers close the connection after
+    every response, so the client reconnects and the connect time counts
+    towards the latency, as it does for real clients of that deployment.
+    """
+    url = urlsplit(base_url)
+    connection = None
+    while time.perf_counter() < deadline:
+        request = (
+            f'GET {path.format(n=next(counter))} HTTP/1.1\r\n'
+            f'Host: {url.netloc}\r\nAccept: application/json\r\nConnection: keep-alive\r\n\r\n'
+        )
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(url.hostname, url.port or 80)
+            reader, writer = connection
+            writer.write(request.encode())
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            errors.append('connection')
+            status, keep_alive = None, False
+
+        if status is not None:
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status != 200:
+                errors.append(status)
+        if not keep_alive and connection is not None:
+            connection[1].close()
+            connection = None
+
+    if connection is not None:
+        connection[1].close()
+
+
+async def run_case(base_url, path, connections, duration):
+    counter = itertools.count()
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        worker(base_url, path, deadline, counter, latencies, errors) for _ in range(connections)
+    ])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0
+    return len(latencies) / elapsed, statistics.median(latencies) if latencies else 0, p99, len(errors)
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument('--wsgi-url', default='http://localhost:8001', help="Base URL of the WSGI deployment.")
+    parser.add_argument('--asgi-url', default='http://localhost:8002', help="Base URL of the ASGI deployment.")
+    parser.add_argument('--connections', type=int, default=200, help="Concurrent keep-alive connections.")
+    parser.add_argument('--duration', type=float, default=20, help="Seconds per case.")
+    args = parser.parse_args()
+
+    seed(args.employees, args.companies)
+    print()
+
+    rows = []
+    for name, path in cases():
+        for deployment, base_url in [('wsgi', args.wsgi_url), ('asgi', args.asgi_url)]:
+            asyncio.run(run_case(base_url, path, min(args.connections, 10), 2))
+            throughput, p50, p99, errors = asyncio.run(run_case(base_url, path, args.connections, args.duration))
+            rows.append([name, deployment, f'{throughput:.0f}', f'{p50:.1f}', f'{p99:.1f}', errors])
+
+    print_table(['case', 'server', 'req/s', 'p50 ms', 'p99 ms', 'non-200'], rows)
+
+    if args.cleanup:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
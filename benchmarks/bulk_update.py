@@ -0,0 +1,78 @@
+"""
+Bulk employee PATCH: the single-pass view against the old row-by-row loop.
+
+    python benchmarks/bulk_update.py --sizes 1000 10000 100000
+
+``legacy`` replays what bulk_manage_employees did before: a get() and a
+serializer.save() UPDATE per row, then a bulk_update() over the same rows.
+``single-pass`` is the current view. Every run is rolled back.
+"""
+import time
+
+from _common import Employee, argument_parser, cleanup, print_table, seed, transaction
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api.serializer import EmployeeSerializer
+from api.views import bulk_manage_employees
+
+
+URL = '/api/employee/bulk/'
+
+
+def payload(size):
+    ids = Employee.objects.filter(email__startswith='bench-').order_by('email').values_list('id', flat=True)[:size]
+    return [{'id': str(employee_id), 'name': f'Frissített {i}', 'age': 20 + i % 40} for i, employee_id in enumerate(ids)]
+
+
+def legacy(rows):
+    request = Request(APIRequestFactory().patch(URL))
+    employees_to_update = []
+    update_fields = []
+    for data in rows:
+        employee = Employee.objects.get(pk=data['id'])
+        serializer = EmployeeSerializer(employee, data=data, partial=True, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        employees_to_update.append(serializer.save())
+        update_fields = list(serializer.validated_data.keys())
+    Employee.objects.bulk_update(employees_to_update, update_fields)
+
+
+def single_pass(rows):
+    response = bulk_manage_employees(APIRequestFactory().patch(URL, rows, format='json'))
+    assert response.status_code == 200, response.data
+
+
+def run(fn, rows):
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries, transaction.atomic():
+        start = time.perf_counter()
+        fn(rows)
+        elapsed = time.perf_counter() - start
+        transaction.set_rollback(True)
+    return elapsed, len(queries)
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+    seed(max(args.employees, *args.sizes), args.companies)
+    print()
+
+    rows = []
+    for size in args.sizes:
+        data = payload(size)
+        for name, fn in [('legacy', legacy), ('single-pass', single_pass)]:
+            elapsed, queries = run(fn, data)
+            rows.append([size, name, f'{elapsed:.2f}', f'{size / elapsed:,.0f}', queries])
+
+    print_table(['rows', 'implementation', 'seconds', 'rows/s', 'queries'], rows)
+
+    if args.cleanup:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Request latency with a new database connection per request, with persistent
+connections and with the psycopg pool.
+
+    docker compose up -d db
+    python benchmarks/db_connections.py --repeat 500
+
+Requests go through Django's WSGIHandler in this process, which fires the
+request_started and request_finished signals exactly like gunicorn does, so
+connections are opened, reused and returned as they are in production.
+Between the cases only the connection settings of ``default`` change. The
+response cache is bypassed with a unique query parameter per request. The
+``connect`` column is the cost of opening one connection.
+"""
+from io import BytesIO
+import itertools
+import time
+
+from _common import Employee, argument_parser, cleanup, measure, print_table, seed
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+
+
+def connect_time(repeat):
+    connection = connections['default']
+    timings = []
+    for _ in range(repeat):
+        connection.close()
+        start = time.perf_counter()
+        connection.connect()
+        timings.append((time.perf_counter() - start) * 1000)
+    connection.close()
+    return sorted(timings)[len(timings) // 2]
+
+
+def configure(conn_max_age=0, pool=None):
+    """Reconfigure ``default`` for the next case, closing whatever the previous one opened."""
+    connection = connections['default']
+    connection.close()
+    if getattr(connection, 'pool', None) is not None:
+        connection.close_pool()
+
+    settings = connection.settings_dict
+    settings['CONN_MAX_AGE'] = conn_max_age
+    settings['CONN_HEALTH_CHECKS'] = conn_max_age > 0
+    options = settings.setdefault('OPTIONS', {})
+    options.pop('pool', None)
+    if pool:
+        options['pool'] = pool
+
+
+def supports_pool():
+    if connections['default'].vendor != 'postgresql':
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return is_psycopg3
+
+
+def environ(path, query_string):
+    return {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query_string, 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost', 'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': BytesIO(),
+    }
+
+
+def run(handler, path, repeat):
+    counter = itertools.count()
+
+    def request():
+        response = handler(environ(path, f'nocache={next(counter)}'), lambda status, headers: None)
+        b''.join(response)
+        response.close()
+
+    return measure(request, repeat)
+
+
+def main():
+    parser = argument_parser(__doc__, employees=10_000)
+    parser.set_defaults(repeat=300)
+    args = parser.parse_args()
+
+    seed(args.employees, args.companies)
+    print()
+    employee = Employee.objects.filter(email__startswith='bench-').values_list('id', flat=True).first()
+    paths = [('employee detail', f'/api/employee/{employee}/'), ('employee list', '/api/employee/')]
+
+    cases = [('new connection per request', {'conn_max_age': 0}), ('persistent, health-checked', {'conn_max_age': 60})]
+    if supports_pool():
+        cases.append(('psycopg pool (1-4)', {'pool': {'min_size': 1, 'max_size': 4}}))
+    else:
+        print('psycopg 3 with psycopg_pool is not installed, skipping the pool case.\n')
+
+    handler = WSGIHandler()
+    configure()
+    connect = connect_time(20)
+
+    rows = []
+    for name, path in paths:
+        for case, config in cases:
+            configure(**config)
+            p50, p99 = run(handler, path, args.repeat)
+            rows.append([name, case, f'{p50:.2f}', f'{p99:.2f}', f'{connect:.2f}'])
+
+    print_table(['endpoint', 'connections', 'p50 ms', 'p99 ms', 'connect ms'], rows)
+
+    configure()
+    if args.cleanup:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+CPU cost of the DRF serializers against the compiled read path (read_data).
+
+    python benchmarks/read_serializers.py --rows 100
+
+Everything runs on unsaved, in-memory instances, so no database is needed and
+the numbers are pure serialization time. Each case also renders both outputs
+with JSONRenderer and checks that the bytes are identical.
+"""
+import uuid
+
+from _common import Company, Employee, FIRST_NAMES, JOB_TITLES, LAST_NAMES, argument_parser, measure, print_table
+from rest_framework.renderers import JSONRenderer
+from api.serializer import CompanySerializer, EmployeeSerializer, read_data, read_plan
+
+
+COMPANY_FIELDS = ['id', 'name', 'address', 'phone', 'description', 'employee_count']
+
+
+def build(rows):
+    company = Company(
+        id=uuid.uuid4(), name='bench-0 Kovács Kft.', address='1234 Budapest Fő utca 1', phone='06301234567',
+        description=None, employee_count=rows
+    )
+    employees = [
+        Employee(
+            id=uuid.uuid4(), name=f'{LAST_NAMES[i % 10]} {FIRST_NAMES[i % 10]}', email=f'bench-{i}@example.com',
+            job_title=JOB_TITLES[i % len(JOB_TITLES)], age=20 + i % 40, company=company
+        )
+        for i in range(rows)
+    ]
+    company._prefetched_objects_cache = {'employees': employees}
+    companies = [
+        Company(id=uuid.uuid4(), name=f'bench-{i}', address='1234 Budapest Fő utca 1', phone='06301234567',
+                description='Tanácsadás', employee_count=i)
+        for i in range(rows)
+    ]
+    values = [
+        {'id': e.id, 'name': e.name, 'email': e.email, 'job_title': e.job_title, 'age': e.age,
+         'company_id': company.id, 'company__name': company.name}
+        for e in employees
+    ]
+    return company, employees, companies, values
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument('--rows', type=int, default=100, help="Rows per page (page_size).")
+    args = parser.parse_args()
+
+    company, employees, companies, values = build(args.rows)
+    employee_plan = read_plan(EmployeeSerializer)
+    cases = [
+        (
+            f'employee list ({args.rows})',
+            lambda: EmployeeSerializer(employees, many=True).data,
+            lambda: read_data(EmployeeSerializer, employees, many=True),
+        ),
+        (
+            f'employee list from .values() ({args.rows})',
+            lambda: EmployeeSerializer(employees, many=True).data,
+            lambda: employee_plan.represent_many(values),
+        ),
+        (
+            f'company list ({args.rows})',
+            lambda: CompanySerializer(companies, many=True, fields=COMPANY_FIELDS).data,
+            lambda: read_data(CompanySerializer, companies, many=True, fields=COMPANY_FIELDS),
+        ),
+        (
+            f'company detail + {args.rows} employees',
+            lambda: CompanySerializer(company, fields=COMPANY_FIELDS + ['employees']).data,
+            lambda: read_data(CompanySerializer, company, fields=COMPANY_FIELDS + ['employees']),
+        ),
+    ]
+
+    renderer = JSONRenderer()
+    rows = []
+    for name, drf, compiled in cases:
+        identical = renderer.render(drf()) == renderer.render(compiled())
+        drf_p50, drf_p99 = measure(drf, args.repeat)
+        fast_p50, fast_p99 = measure(compiled, args.repeat)
+        rows.append([
+            name, f'{drf_p50:.2f}', f'{drf_p99:.2f}', f'{fast_p50:.2f}', f'{fast_p99:.2f}',
+            f'{drf_p50 / fast_p50:.1f}x', 'yes' if identical else 'NO'
+        ])
+
+    print_table(['case', 'DRF p50 ms', 'DRF p99 ms', 'compiled p50 ms', 'compiled p99 ms', 'speedup', 'identical'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Latency of the icontains query parameters with and without the trigram indexes.
+
+    python benchmarks/substring_filters.py --employees 1000000
+
+Each case runs what a paginated list request runs: the COUNT(*) and the first
+page. ``icontains`` is the old ``UPPER(col) LIKE`` query, ``trigram_contains``
+is the lookup the views use now.
+"""
+from _common import Company, Employee, argument_parser, cleanup, connection, measure, print_table, seed
+
+
+CASES = [
+    (Employee, 'name', 'vács'),
+    (Employee, 'email', 'ch-4242'),
+    (Employee, 'company__name', '-123 '),
+    (Company, 'name', 'molnár'),
+    (Company, 'address', 'petőfi'),
+    (Company, 'phone', '3012'),
+    (Company, 'description', 'tanács'),
+]
+
+
+def query_plan(queryset):
+    return queryset.explain().splitlines()[0].strip() if connection.vendor == 'postgresql' else ''
+
+
+def main():
+    args = argument_parser(__doc__, employees=1_000_000).parse_args()
+    seed(args.employees, args.companies)
+    print()
+
+    rows = []
+    for model, field, term in CASES:
+        for lookup in ['icontains', 'trigram_contains']:
+            queryset = model.objects.filter(**{f'{field}__{lookup}': term}).order_by('id')
+            p50, p99 = measure(lambda: (queryset.count(), list(queryset[:5])), args.repeat)
+            rows.append([model.__name__, field, lookup, f'{p50:.2f}', f'{p99:.2f}', query_plan(queryset)])
+
+    print_table(['model', 'filter', 'lookup', 'p50 ms', 'p99 ms', 'plan'], rows)
+
+    if args.cleanup:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+"""
+Gunicorn settings. Gunicorn reads this file from its working directory, the
+project root, for both the WSGI and the ASGI (uvicorn worker) servers.
+"""
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Excercize.settings')
+
+
+def on_starting(server):
+    from api import metrics
+    metrics.clear()
+
+
+def child_exit(server, worker):
+    from api import metrics
+    metrics.archive_process(worker.pid)